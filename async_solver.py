@@ -0,0 +1,97 @@
+"""
+This module lets asyncio code solve puzzles without blocking the event loop. Searches run on a
+thread pool owned by an AsyncSolver, and cancelling the awaiting task stops the search.
+
+    async with AsyncSolver(max_concurrency=4) as solver:
+        solutions = await solver.solve("SEND + MORE = MONEY")
+        async for solution in solver.iter_solutions("WRONG + WRONG = RIGHT"):
+            ...
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Union
+from results import SolutionSet, SolutionStream
+from solver import iter_solutions
+
+_DONE = object()
+
+def _drain(stream: SolutionStream) -> SolutionSet:
+    solutions = SolutionSet(stream.puzzles, stream.letters, stream.error)
+    for digits in stream.iter_digits():
+        solutions.add(digits)
+    return solutions.dedupe()
+
+class AsyncSolver:
+    """
+    Solves puzzles for asyncio code on a pool of `max_concurrency` threads.
+
+    At most `max_concurrency` searches run at once; further calls wait for a free slot, so a
+    burst of requests queues up in the event loop instead of piling work onto the threads.
+    An AsyncSolver may be shared by any number of tasks, but only within one event loop.
+    """
+    def __init__(self, max_concurrency: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="async-solver")
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._streams = set()
+
+    async def _open(self, puzzles, base: int, constraints: Optional[Dict[str, int]], options: Dict) -> SolutionStream:
+        # Parsing, presolve and model building also block, so they run on the pool too.
+        loop = asyncio.get_running_loop()
+        stream = await loop.run_in_executor(self._executor, functools.partial(
+            iter_solutions, puzzles, base=base, constraints=constraints, **options))
+        self._streams.add(stream)
+        return stream
+
+    async def solve(self, puzzles: Union[str, List[str]], base: int = 10, constraints: Optional[Dict[str, int]] = None,
+                    compact: bool = False, **options) -> Union[List[str], SolutionSet]:
+        """
+        Returns what solve_cryptarithm would: the sorted solution strings, or a SolutionSet with
+        `compact=True`. `options` are passed to solver.iter_solutions, e.g. backend, encoding,
+        max_solutions, time_limit or division. Cancelling the caller stops the search.
+        """
+        async with self._slots:
+            stream = await self._open(puzzles, base, constraints, options)
+            try:
+                solutions = await asyncio.get_running_loop().run_in_executor(self._executor, _drain, stream)
+            except asyncio.CancelledError:
+                stream.cancel()
+                raise
+            finally:
+                self._streams.discard(stream)
+        return solutions if compact else solutions.strings()
+
+    async def iter_solutions(self, puzzles: Union[str, List[str]], base: int = 10,
+                             constraints: Optional[Dict[str, int]] = None, **options) -> AsyncIterator[str]:
+        """
+        Yields formatted solutions as the search finds them. The search only runs ahead of the
+        consumer by the stream's queue, and stops when the consumer stops iterating or is cancelled.
+        Invalid puzzles yield nothing; use solve() to get the error message.
+        """
+        async with self._slots:
+            stream = await self._open(puzzles, base, constraints, options)
+            loop = asyncio.get_running_loop()
+            try:
+                while True:
+                    # Solutions are formatted on the worker thread as well.
+                    solution = await loop.run_in_executor(self._executor, next, stream, _DONE)
+                    if solution is _DONE:
+                        return
+                    yield solution
+            finally:
+                # Safe even while a worker is inside the stream; close() is not.
+                stream.cancel()
+                self._streams.discard(stream)
+
+    async def close(self):
+        """Cancels running searches and queued work, and waits for the threads to finish."""
+        for stream in list(self._streams):
+            stream.cancel()
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True, cancel_futures=True))
+
+    async def __aenter__(self) -> "AsyncSolver":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,380 @@
+"""
+This module provides a pure-Python/NumPy cryptarithm solver that needs no constraint-solver library.
+Letters that appear in '+'/'-' equations are assigned by column-ordered backtracking with carry
+pruning. The remaining letters, which only appear under '*', '/' or '^', are enumerated in blocks
+of candidate assignments that are checked with vectorized NumPy evaluation.
+"""
+import itertools
+import math
+import threading
+import time
+import numpy as np
+from parser import parse_multi_puzzle, Operation, Word, Number
+from common import (_get_all_letters, _parse_and_validate, _ParsedPuzzle, _is_additive,
+                    _is_ratio_equation, _build_columns, _signed_terms)
+from presolve import _run_presolve
+from results import SolutionSet, SolutionStream, SolveStats, _new_stats, _emit_stats
+from typing import Dict, Union, List, Optional
+
+BLOCK_SIZE = 1 << 16
+INT64_SAFE_BOUND = 1 << 62
+# Exponents above this are rejected for bases >= 2; the result would not fit any puzzle word.
+MAX_EXPONENT = 4096
+# Auto-selection thresholds used by prefers_backtracking.
+MAX_TAIL_CANDIDATES = 20000
+MAX_ADDITIVE_LETTERS = 8
+
+def _expand_permutations(rows: np.ndarray, available: np.ndarray, length: int) -> np.ndarray:
+    """Extends each row of distinct digits with every unused available digit until it has `length` columns."""
+    while rows.shape[1] < length:
+        unused = (rows[:, None, :] != available[None, :, None]).all(axis=2)
+        row_index, digit_index = np.nonzero(unused)
+        rows = np.column_stack([rows[row_index], available[digit_index]])
+    return rows
+
+def _permutation_blocks(available: List[int], length: int):
+    """
+    Yields all ordered selections of `length` distinct digits as int64 arrays of at most about
+    BLOCK_SIZE rows. A short prefix is enumerated in Python and the rest is expanded in NumPy.
+    """
+    digits = np.array(available, dtype=np.int64)
+    prefix_length = 0
+    while prefix_length < length and math.perm(len(available) - prefix_length, length - prefix_length) > BLOCK_SIZE:
+        prefix_length += 1
+    for prefix in itertools.permutations(available, prefix_length):
+        rows = np.array([prefix], dtype=np.int64).reshape(1, prefix_length)
+        yield _expand_permutations(rows, digits, length)
+
+def _magnitude(node: Union[Operation, Word, Number], base: int):
+    """Returns upper bounds for |numerator| and |denominator| of a node's rational value."""
+    if isinstance(node, Number):
+        return int("".join(map(str, node.digits))), 1
+    if isinstance(node, Word):
+        return base ** len(node.letters), 1
+    if node.op in ('+', '-'):
+        num, den = 0, 1
+        for _, term in _signed_terms(node):
+            t_num, t_den = _magnitude(term, base)
+            num, den = num * t_den + t_num * den, den * t_den
+        return num, den
+    l_num, l_den = _magnitude(node.left, base)
+    r_num, r_den = _magnitude(node.right, base)
+    if node.op in ('+', '-', '='):
+        return l_num * r_den + r_num * l_den, l_den * r_den
+    if node.op == '*':
+        return l_num * r_num, l_den * r_den
+    if node.op == '/':
+        return l_num * r_den, l_den * r_num
+    return math.inf, 1
+
+def _nonzero(denominator):
+    """Replaces zero denominators by one so that integer division stays defined."""
+    if isinstance(denominator, np.ndarray):
+        return np.where(denominator == 0, 1, denominator)
+    return denominator if denominator != 0 else 1
+
+def _evaluate(node: Union[Operation, Word, Number], values: Dict, base: int, division: str = "exact",
+              ratio: bool = False):
+    """
+    Evaluates a node over scalar or array letter values.
+    Returns (numerator, denominator, valid). Quotients follow `division` (see common.DIVISIONS),
+    except that with `ratio` a root '/' stays a fraction, matching the cross-multiplication the
+    CP-SAT model uses for A/B = C/D. `valid` is False where a divisor is zero, an exact quotient
+    is not whole or an exponentiation is undefined.
+    """
+    if isinstance(node, Number):
+        return int("".join(map(str, node.digits))), 1, True
+
+    if isinstance(node, Word):
+        value = 0
+        for element in node.letters:
+            value = value * base + (values[element] if isinstance(element, str) else element)
+        return value, 1, True
+
+    if node.op in ('+', '-'):
+        # Sums are walked as one chain, so thousands of terms do not recurse.
+        num, den, valid = 0, 1, True
+        for sign, term in _signed_terms(node):
+            t_num, t_den, t_valid = _evaluate(term, values, base, division)
+            num, den, valid = num * t_den + sign * t_num * den, den * t_den, valid & t_valid
+        return num, den, valid
+
+    l_num, l_den, l_valid = _evaluate(node.left, values, base, division)
+    r_num, r_den, r_valid = _evaluate(node.right, values, base, division)
+    valid = l_valid & r_valid
+
+    if node.op == '*':
+        return l_num * r_num, l_den * r_den, valid
+    if node.op == '/':
+        numerator, denominator = l_num * r_den, l_den * r_num
+        valid = valid & (r_num != 0)
+        if ratio:
+            return numerator, denominator, valid
+        # Zero divisors are already invalid; keep the integer division defined.
+        denominator = _nonzero(denominator)
+        if division == "exact":
+            valid = valid & (numerator % denominator == 0)
+        return numerator // denominator, 1, valid
+    if node.op == '^':
+        if isinstance(valid, np.ndarray):
+            # Rows with a zero divisor are already invalid; keep the integer checks defined.
+            l_den, r_den = _nonzero(l_den), _nonzero(r_den)
+        elif not valid:
+            return 0, 1, False
+        # Base and exponent must be non-negative integers, as in the CP-SAT power table.
+        pow_base = l_num // l_den
+        exponent = r_num // r_den
+        valid = (valid & (l_num % l_den == 0) & (r_num % r_den == 0) & (pow_base >= 0) & (exponent >= 0)
+                 & ((exponent <= MAX_EXPONENT) | (pow_base <= 1)))
+        if isinstance(valid, np.ndarray):
+            pow_base = np.where(valid, pow_base, 0)
+            exponent = np.where(valid, exponent, 0)
+        elif not valid:
+            return 0, 1, False
+        return pow_base ** exponent, 1, valid
+
+    raise ValueError(f"Unsupported operator: {node.op}")
+
+def _holds(equation: Operation, values: Dict, base: int, division: str = "exact"):
+    """Checks an equation over scalar or array letter values."""
+    ratio = _is_ratio_equation(equation, division)
+    l_num, l_den, l_valid = _evaluate(equation.left, values, base, division, ratio)
+    r_num, r_den, r_valid = _evaluate(equation.right, values, base, division, ratio)
+    return l_valid & r_valid & (l_num * r_den == r_num * l_den)
+
+def _split_letters(asts: List[Operation], all_letters: List[str], constraints: Dict[str, int], base: int):
+    """
+    Orders letters for the search.
+    Returns the backtracking order (constrained letters first, then additive letters column by
+    column) and the tail of letters that only appear in non-additive equations.
+    """
+    order = list(constraints)
+    seen = set(order)
+    additive = [ast for ast in asts if _is_additive(ast.left) and _is_additive(ast.right)]
+    columns = [_build_columns(ast, base) for ast in additive]
+    for column in range(max((len(c) for c in columns), default=0)):
+        for eq_columns in columns:
+            if column < len(eq_columns):
+                for letter in eq_columns[column][0]:
+                    if letter not in seen:
+                        seen.add(letter)
+                        order.append(letter)
+    tail = [l for l in all_letters if l not in seen]
+    return order, tail, columns
+
+def _column_checks(order: List[str], columns: List) -> List[List]:
+    """Schedules each column check at the search depth where all of its letters are assigned."""
+    position = {letter: i for i, letter in enumerate(order)}
+    checks = [[] for _ in range(len(order) + 1)]
+    for eq_index, eq_columns in enumerate(columns):
+        depth = 0
+        for col_index, (coefficients, constant) in enumerate(eq_columns):
+            terms = [(position[l], coef) for l, coef in coefficients.items() if coef != 0]
+            depth = max([depth] + [position[l] + 1 for l in coefficients])
+            is_last = col_index == len(eq_columns) - 1
+            checks[depth].append((eq_index, col_index, terms, constant, is_last))
+    return checks
+
+def prefers_backtracking(puzzles: Union[str, List[str]], base=10, constraints=None) -> bool:
+    """
+    Heuristic used by solve_cryptarithm(backend="auto").
+    Small additive searches and small blocks of non-additive candidates are answered faster here
+    than by building a CP-SAT model; everything else goes to CP-SAT.
+    """
+    constraints = constraints or {}
+    if isinstance(puzzles, str):
+        puzzles = [puzzles]
+    try:
+        asts = parse_multi_puzzle(puzzles)
+    except ValueError:
+        return True  # Either backend only reports the parse error.
+    all_letters = set()
+    for ast in asts:
+        all_letters.update(_get_all_letters(ast))
+    if len(all_letters) > base:
+        return True
+    order, tail, _ = _split_letters(asts, sorted(all_letters), {l: d for l, d in constraints.items() if l in all_letters}, base)
+    free_additive = len(order) - len(constraints)
+    if free_additive > MAX_ADDITIVE_LETTERS or base > 10:
+        return False
+    available = base - len(order)
+    return len(tail) <= available and math.perm(available, len(tail)) <= MAX_TAIL_CANDIDATES
+
+class _SearchTimeout(Exception):
+    """Raised inside the search once its deadline has passed."""
+
+def _iter_assignments(asts: List[Operation], all_letters: List[str], first_letters, constraints: Dict[str, int], base: int,
+                      deadline=None, stats: Optional[SolveStats] = None, letter_domains=None, division="exact",
+                      cancelled: Optional[threading.Event] = None):
+    """
+    Yields every letter-to-digit assignment that satisfies all equations, with quotients
+    following `division`.
+    Raises _SearchTimeout if `deadline` (a time.monotonic() value) passes or `cancelled` is set
+    during the search.
+    With `stats`, the search node and vectorized candidate counts are stored in stats.search.
+    `letter_domains`, e.g. from the presolve pass, maps letters to the digits they may take.
+    """
+    order, tail, columns = _split_letters(asts, all_letters, constraints, base)
+    checks = _column_checks(order, columns)
+    others = [ast for ast in asts if not (_is_additive(ast.left) and _is_additive(ast.right))]
+    use_objects = any(max(_magnitude(ast, base)) >= INT64_SAFE_BOUND for ast in others)
+
+    domains = []
+    for letter in order:
+        if letter in constraints:
+            domains.append([constraints[letter]])
+        elif letter_domains is not None:
+            domains.append(letter_domains[letter])
+        else:
+            domains.append(range(1 if letter in first_letters else 0, base))
+    tail_nonzero = [j for j, letter in enumerate(tail) if letter in first_letters]
+    # Lookup tables of the digits each presolve-narrowed tail letter may take.
+    tail_allowed = []
+    for j, letter in enumerate(tail):
+        if letter_domains is not None and len(letter_domains[letter]) < base:
+            allowed = np.zeros(base, dtype=bool)
+            allowed[letter_domains[letter]] = True
+            tail_allowed.append((j, allowed))
+
+    digits = [0] * len(order)
+    used = [False] * base
+    carries = [[0] * (len(eq_columns) + 1) for eq_columns in columns]
+    nodes = [0]
+    candidates = [0]
+
+    def check_deadline():
+        if deadline is not None and time.monotonic() > deadline:
+            raise _SearchTimeout()
+        if cancelled is not None and cancelled.is_set():
+            raise _SearchTimeout()
+
+    def columns_hold(depth):
+        for eq_index, col_index, terms, constant, is_last in checks[depth]:
+            column_sum = constant + carries[eq_index][col_index]
+            for pos, coef in terms:
+                column_sum += coef * digits[pos]
+            if is_last:
+                if column_sum != 0:
+                    return False
+            elif column_sum % base:
+                return False
+            else:
+                carries[eq_index][col_index + 1] = column_sum // base
+        return True
+
+    def tail_assignments():
+        prefix = dict(zip(order, digits))
+        available = [d for d in range(base) if not used[d]]
+        for block in _permutation_blocks(available, len(tail)):
+            check_deadline()
+            candidates[0] += len(block)
+            mask = np.ones(len(block), dtype=bool)
+            for j in tail_nonzero:
+                mask &= block[:, j] != 0
+            for j, allowed in tail_allowed:
+                mask &= allowed[block[:, j]]
+            if use_objects:
+                block = block.astype(object)
+            values = dict(prefix)
+            values.update({letter: block[:, j] for j, letter in enumerate(tail)})
+            for equation in others:
+                mask &= np.asarray(_holds(equation, values, base, division), dtype=bool)
+            for row in block[mask]:
+                assignment = dict(prefix)
+                assignment.update({letter: int(d) for letter, d in zip(tail, row)})
+                yield assignment
+
+    def search(depth):
+        if depth == len(order):
+            yield from tail_assignments()
+            return
+        nodes[0] += 1
+        if nodes[0] % 4096 == 0:
+            check_deadline()
+        for digit in domains[depth]:
+            if used[digit]:
+                continue
+            digits[depth] = digit
+            used[digit] = True
+            if columns_hold(depth + 1):
+                yield from search(depth + 1)
+            used[digit] = False
+
+    try:
+        if columns_hold(0):
+            yield from search(0)
+    finally:
+        if stats is not None:
+            stats.search.update({"nodes": nodes[0], "tail_letters": len(tail), "tail_candidates": candidates[0]})
+
+def _search_digits(parsed: _ParsedPuzzle, time_limit=None, stats: Optional[SolveStats] = None, domains=None,
+                   cancelled: Optional[threading.Event] = None):
+    """
+    Yields each solution as a digit tuple aligned with parsed.all_letters.
+    Returns True if the search was exhaustive and False if the time limit or `cancelled` stopped it.
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    try:
+        for assignment in _iter_assignments(parsed.asts, parsed.all_letters, parsed.first_letters,
+                                            parsed.constraints, parsed.base, deadline, stats, domains, parsed.division,
+                                            cancelled):
+            yield tuple(assignment[letter] for letter in parsed.all_letters)
+    except _SearchTimeout:
+        return False
+    return True
+
+def solve_with_backtracking(puzzles: Union[str, List[str]], base=10, constraints=None, stats_hook=None, compact=False,
+                            division="exact"):
+    """
+    Solves a cryptarithm puzzle without OR-Tools.
+    Accepts the same arguments and returns the same messages and solution strings, or with
+    `compact=True` the same SolutionSet, as solve_with_cp_sat.
+    """
+    stats = _new_stats(stats_hook, "backtracking")
+    parsed, error = _parse_and_validate(puzzles, base, constraints, stats, division)
+    if error:
+        _emit_stats(stats, stats_hook)
+        return SolutionSet([puzzles] if isinstance(puzzles, str) else puzzles, (), error) if compact else [error]
+
+    solutions = SolutionSet(parsed.puzzles, parsed.all_letters)
+    presolved = _run_presolve(parsed, stats)
+    start = time.perf_counter()
+    if not presolved.infeasible:
+        for digits in _search_digits(parsed, stats=stats, domains=presolved.domains):
+            solutions.add(digits)
+    solutions.dedupe()
+    if stats is not None:
+        stats.add_time("solve", time.perf_counter() - start)
+        stats.solutions = len(solutions)
+        stats.complete = True
+
+    if compact:
+        _emit_stats(stats, stats_hook)
+        return solutions
+    start = time.perf_counter()
+    result = solutions.strings()
+    if stats is not None:
+        stats.add_time("format", time.perf_counter() - start)
+        _emit_stats(stats, stats_hook)
+    return result
+
+def iter_with_backtracking(puzzles: Union[str, List[str]], base=10, constraints=None, max_solutions=None,
+                           count_only=False, time_limit=None, collect_stats=False, stats_hook=None,
+                           division="exact") -> SolutionStream:
+    """
+    Streams the solutions of a cryptarithm puzzle as the backtracking search finds them.
+    See SolutionStream for the iteration protocol and how early stops are reported.
+    With `collect_stats` or a `stats_hook`, the stream's `stats` attribute is filled in.
+    """
+    stats = SolveStats("backtracking") if collect_stats else _new_stats(stats_hook, "backtracking")
+    parsed, error = _parse_and_validate(puzzles, base, constraints, stats, division)
+    if error:
+        return SolutionStream([puzzles] if isinstance(puzzles, str) else puzzles, [], None, error=error,
+                              stats=stats, stats_hook=stats_hook)
+    presolved = _run_presolve(parsed, stats)
+    if presolved.infeasible:
+        return SolutionStream(parsed.puzzles, parsed.all_letters, None, stats=stats, stats_hook=stats_hook)
+    cancelled = threading.Event()
+    search = _search_digits(parsed, time_limit, stats, presolved.domains, cancelled)
+    return SolutionStream(parsed.puzzles, parsed.all_letters, search, max_solutions, count_only,
+                          stats=stats, stats_hook=stats_hook, cancelled=cancelled)
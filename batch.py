@@ -0,0 +1,188 @@
+"""
+This module solves many cryptarithm puzzles in parallel across a process pool.
+Puzzles are read from an iterable or a JSONL file and results stream back, in input order, as
+one JSON object per puzzle.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional
+from solver import iter_solutions
+
+# Extra seconds a chunk may run past its solver time limits (parsing, model building, start-up)
+# before its worker is considered stuck and the pool is replaced.
+HARD_TIMEOUT_GRACE = 5.0
+
+INVALID_ITEM = "Expected a JSON object or a puzzle string."
+
+class InvalidLine:
+    """Stands in for an input line that is not valid JSON, so it is reported like any bad item."""
+    def __init__(self, error: str):
+        self.error = error
+
+def _normalize_item(item, index: int) -> Dict:
+    """
+    Accepts a puzzle string or a dict with puzzle/puzzles, base and constraints. Anything else
+    becomes an item with an "error", which solve_item reports without solving.
+    """
+    if isinstance(item, str):
+        item = {"puzzle": item}
+    if not isinstance(item, dict):
+        error = item.error if isinstance(item, InvalidLine) else INVALID_ITEM
+        return {"id": index, "puzzle": None, "base": None, "constraints": {}, "error": error}
+    puzzle = item.get("puzzles", item.get("puzzle"))
+    return {
+        "id": item.get("id", index),
+        "puzzle": puzzle,
+        "base": item.get("base", 10),
+        "constraints": item.get("constraints") or {},
+    }
+
+def _result(item: Dict, status: str, **fields) -> Dict:
+    return {"id": item["id"], "puzzle": item["puzzle"], "base": item["base"], "status": status, **fields}
+
+def solve_item(item: Dict, timeout: Optional[float] = None, max_solutions=None, backend="auto", encoding="auto") -> Dict:
+    """
+    Solves one normalized batch item and returns its JSON-ready result.
+    Errors are reported in the result instead of being raised, so one bad puzzle cannot abort a batch.
+    """
+    if item.get("error"):
+        return _result(item, "error", error=item["error"], elapsed=0.0)
+    start = time.perf_counter()
+    try:
+        if not item["puzzle"]:
+            raise ValueError("Batch item has no 'puzzle'.")
+        constraints = {letter.upper(): int(digit) for letter, digit in item["constraints"].items()}
+        stream = iter_solutions(item["puzzle"], base=int(item["base"]), constraints=constraints, backend=backend,
+                                encoding=encoding, max_solutions=max_solutions, time_limit=timeout)
+        solutions = sorted(stream)
+    except Exception as e:
+        return _result(item, "error", error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    if stream.error:
+        return _result(item, "error", error=stream.error, elapsed=elapsed)
+    status = "timeout" if stream.stop_reason == "time_limit" else "ok"
+    return _result(item, status, solutions=solutions, count=stream.count, complete=stream.complete, elapsed=elapsed)
+
+def _solve_chunk(chunk: List[Dict], options: Dict) -> List[Dict]:
+    return [solve_item(item, **options) for item in chunk]
+
+def _kill_pool(pool: ProcessPoolExecutor):
+    """Shuts a pool down without waiting for stuck workers."""
+    # ProcessPoolExecutor cannot cancel a running task, so stuck workers are terminated directly.
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def solve_batch(items: Iterable, workers: Optional[int] = None, chunksize: int = 1, timeout: Optional[float] = None,
+                max_solutions=None, backend="auto", encoding="auto", max_pending: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Solves puzzles across a ProcessPoolExecutor and yields one result dict per puzzle, in input order.
+
+    `timeout` is the per-puzzle solver time limit in seconds. A chunk that overruns its combined
+    limits by more than HARD_TIMEOUT_GRACE is treated as stuck: its puzzles are reported with
+    status "timeout", the pool is replaced and the remaining chunks are resubmitted. At most
+    `max_pending` chunks (default: twice the worker count) are in flight, so arbitrarily long
+    inputs are consumed lazily.
+    """
+    options = {"timeout": timeout, "max_solutions": max_solutions, "backend": backend, "encoding": encoding}
+    items = (_normalize_item(item, index) for index, item in enumerate(items))
+    chunks = iter(lambda: list(itertools.islice(items, chunksize)), [])
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    def submit(chunk):
+        pending.append((chunk, pool.submit(_solve_chunk, chunk, options)))
+
+    def finish_head():
+        nonlocal pool
+        chunk, future = pending.popleft()
+        hard_timeout = None if timeout is None else len(chunk) * timeout + HARD_TIMEOUT_GRACE
+        try:
+            return future.result(timeout=hard_timeout)
+        except FutureTimeoutError:
+            results = [_result(item, "timeout", error="Worker exceeded the hard time limit.") for item in chunk]
+        except BrokenProcessPool as e:
+            results = [_result(item, "error", error=f"Worker process failed: {e}") for item in chunk]
+        except Exception as e:
+            return [_result(item, "error", error=f"{type(e).__name__}: {e}") for item in chunk]
+
+        # The pool is stuck or broken: replace it and resubmit everything still in flight.
+        _kill_pool(pool)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        resubmit = [chunk for chunk, _ in pending]
+        pending.clear()
+        for waiting in resubmit:
+            submit(waiting)
+        return results
+
+    try:
+        for chunk in chunks:
+            submit(chunk)
+            while len(pending) >= max_pending:
+                yield from finish_head()
+        while pending:
+            yield from finish_head()
+    finally:
+        if pending:
+            _kill_pool(pool)
+        else:
+            pool.shutdown()
+
+def read_jsonl(stream) -> Iterator:
+    """
+    Reads one puzzle per non-empty line. Lines may be JSON objects or bare puzzle strings; a line
+    that is not valid JSON is yielded as an InvalidLine.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(("{", "\"")):
+            yield line
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            item = InvalidLine(f"Invalid JSON: {e}")
+        yield item
+
+def main(argv=None):
+    """Command-line entry point: python batch.py puzzles.jsonl -o results.jsonl --workers 8"""
+    parser = argparse.ArgumentParser(description="Solve a JSONL file of cryptarithm puzzles in parallel.")
+    parser.add_argument("input", help="JSONL file with one puzzle per line, or '-' for stdin.")
+    parser.add_argument("-o", "--output", default="-", help="Where to write JSONL results (default: stdout).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--chunksize", type=int, default=1, help="Puzzles sent to a worker at a time.")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-puzzle time limit in seconds.")
+    parser.add_argument("--max-solutions", type=int, default=None, help="Stop each puzzle after this many solutions.")
+    parser.add_argument("--backend", default="auto", choices=["auto", "cp-sat", "backtracking"])
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        results = solve_batch(read_jsonl(source), workers=args.workers, chunksize=args.chunksize,
+                              timeout=args.timeout, max_solutions=args.max_solutions, backend=args.backend)
+        for result in results:
+            sink.write(json.dumps(result) + "\n")
+            sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+if __name__ == "__main__":
+    main()
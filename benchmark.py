@@ -0,0 +1,277 @@
+"""
+This module benchmarks the solver backends on a curated corpus of puzzles and checks the results
+against a stored baseline to catch performance regressions before deploying.
+
+    python benchmark.py --output results.json --csv results.csv
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from ortools.sat.python import cp_model
+from common import _parse_and_validate, _is_additive
+from presolve import presolve_parsed
+from or_tools_solver import _build_model, CryptarithmSolutionCallback
+from backtracking_solver import _search_digits
+from results import SolutionStream
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak memory is then not reported.
+    resource = None
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    puzzle: str
+    base: int = 10
+    constraints: Dict[str, int] = field(default_factory=dict)
+    # The backtracking engine is only run where it finishes in reasonable time.
+    backtracking: bool = False
+    # Cases whose full enumeration takes too long only time parsing and presolve, as "presolve".
+    search: bool = True
+
+CORPUS = [
+    # The puzzles from test_solver.py.
+    BenchmarkCase("send_more_money", "SEND + MORE = MONEY", backtracking=True),
+    BenchmarkCase("abcd_times_9", "ABCD * 9 = DCBA", backtracking=True),
+    BenchmarkCase("alfred_base_9", "ALFRED / E = NEUMAN", base=9, backtracking=True),
+    BenchmarkCase("unsolvable_addition", "THIS + IS = WRONG", backtracking=True),
+    BenchmarkCase("unsolvable_product", "A * B = CDE", backtracking=True),
+    BenchmarkCase("wrong_wrong_right", "WRONG + WRONG = RIGHT", constraints={'O': 3}, backtracking=True),
+    BenchmarkCase("sin_cos_unite", "SIN*SIN+COS*COS=UNITE"),
+    BenchmarkCase("multiple_addends", "THIS + ISA + GREAT + TIME = WASTER", backtracking=True),
+    BenchmarkCase("cross_division", "EVE/DID=TALK/9999", backtracking=True),
+    # Long additions.
+    BenchmarkCase("wrong_wrong_all", "WRONG + WRONG = RIGHT", backtracking=True),
+    BenchmarkCase("so_many_more_men", "SO+MANY+MORE+MEN+SEEM+TO+SAY+THAT+THEY+MAY+SOON+TRY+TO+STAY+AT+HOME+SO+AS+TO+SEE"
+                  "+OR+HEAR+THE+SAME+ONE+MAN+TRY+TO+MEET+THE+TEAM+ON+THE+MOON+AS+HE+HAS+AT+THE+OTHER+TEN=TESTS"),
+    # Larger bases.
+    BenchmarkCase("multiple_addends_base_16", "THIS + ISA + GREAT + TIME = WASTER", base=16),
+    BenchmarkCase("green_blue_orange_base_16", "GREEN - BLUE = ORANGE", base=16, backtracking=True),
+    BenchmarkCase("count_inputs_base_36", "COUNT+COUNT+COUNT+COUNT=INPUTS", base=36),
+    # Multiplication, division and exponentiation.
+    BenchmarkCase("three_by_two_product", "ABC*DE=FGHI"),
+    BenchmarkCase("two_digit_quotient", "AB/C=DE", backtracking=True),
+    BenchmarkCase("nested_quotient", "(AB*CD)/EF+G=HIJ"),
+    BenchmarkCase("power_table", "A^B^C=D", backtracking=True),
+    BenchmarkCase("power_under_sum", "A^B^C+D=EF", backtracking=True),
+    BenchmarkCase("power_base_16", "AB^C+D=EFG", base=16),
+    BenchmarkCase("power_base_36", "ABC^D=EFGHIJKL", base=36),
+    # Presolve runs before every solve, so a large tree in a large base must stay cheap.
+    BenchmarkCase("presolve_products_base_36", "ABCD*EFGH+IJKL*MNOP=QRSTUVWXY", base=36, search=False),
+]
+
+# (name, backend, encoding) for every configuration that is measured.
+CONFIGURATIONS = [
+    ("cp-sat/auto", "cp-sat", "auto"),
+    ("cp-sat/words", "cp-sat", "words"),
+    ("cp-sat/columns", "cp-sat", "columns"),
+    ("backtracking", "backtracking", None),
+    ("presolve", "presolve", None),
+]
+
+def _run_once(case: BenchmarkCase, backend: str, encoding: Optional[str]) -> Dict:
+    """
+    Runs one case end to end and returns its phase timings in seconds and the solution count.
+    The presolve pass is counted as part of "build" and also reported on its own. The "presolve"
+    backend stops after it, with no solutions counted.
+    """
+    start = time.perf_counter()
+    parsed, error = _parse_and_validate(case.puzzle, case.base, dict(case.constraints))
+    parsed_at = time.perf_counter()
+    if error:
+        raise ValueError(error)
+
+    presolved = presolve_parsed(parsed)
+    presolved_at = time.perf_counter()
+    if presolved.infeasible or backend == "presolve":
+        built_at = time.perf_counter()
+        count = 0
+    elif backend == "cp-sat":
+        model, letter_vars = _build_model(parsed, encoding, presolved.domains)
+        built_at = time.perf_counter()
+        solver = cp_model.CpSolver()
+        solver.parameters.enumerate_all_solutions = True
+        callback = CryptarithmSolutionCallback(letter_vars, parsed.puzzles)
+        solver.Solve(model, callback)
+        count = len(callback.solutions.dedupe())
+    else:
+        built_at = time.perf_counter()
+        stream = SolutionStream(parsed.puzzles, parsed.all_letters, _search_digits(parsed, domains=presolved.domains))
+        count = sum(1 for _ in stream)
+    solved_at = time.perf_counter()
+
+    return {
+        "parse": parsed_at - start,
+        "presolve": presolved_at - parsed_at,
+        "build": built_at - parsed_at,
+        "solve": solved_at - built_at,
+        "total": solved_at - start,
+        "solutions": count,
+    }
+
+def _peak_rss(case: BenchmarkCase, backend: str, encoding: Optional[str]) -> int:
+    """Runs a case once and returns this process's peak resident set size in bytes."""
+    _run_once(case, backend, encoding)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kilobytes.
+
+def _measure_peak_rss(case: BenchmarkCase, backend: str, encoding: Optional[str]) -> Optional[int]:
+    """
+    Runs a case in a freshly spawned process and returns its peak RSS, which includes CP-SAT's
+    native memory as well as the interpreter and imported libraries every case shares.
+    """
+    if resource is None:
+        return None
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_peak_rss, case, backend, encoding).result()
+
+def run_case(case: BenchmarkCase, config: str, backend: str, encoding: Optional[str], repeat: int) -> Dict:
+    """Measures a case under one configuration: best-of-`repeat` timings plus one run in a fresh process for peak memory."""
+    runs = [_run_once(case, backend, encoding) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run["total"])
+    peak = _measure_peak_rss(case, backend, encoding)
+
+    return {
+        "case": case.name,
+        "config": config,
+        "base": case.base,
+        "parse_s": best["parse"],
+        "presolve_s": best["presolve"],
+        "build_s": best["build"],
+        "solve_s": best["solve"],
+        "total_s": best["total"],
+        "solutions": best["solutions"],
+        "solutions_per_s": best["solutions"] / best["solve"] if best["solve"] > 0 else 0.0,
+        "peak_rss_bytes": peak,
+        "error": None,
+    }
+
+def _is_column_case(case: BenchmarkCase) -> bool:
+    """
+    Whether the column encoding applies, i.e. every equation only uses '+' and '-'. Puzzles that
+    do not parse count as column cases, so that their error is reported.
+    """
+    parsed, error = _parse_and_validate(case.puzzle, case.base, dict(case.constraints))
+    return parsed is None or all(_is_additive(ast.left) and _is_additive(ast.right) for ast in parsed.asts)
+
+def _error_row(case: BenchmarkCase, config: str, error: str) -> Dict:
+    """A row for a run that raised; its measurements are None, so it never passes for a result."""
+    return {"case": case.name, "config": config, "base": case.base, "parse_s": None, "presolve_s": None,
+            "build_s": None, "solve_s": None, "total_s": None, "solutions": None, "solutions_per_s": None,
+            "peak_rss_bytes": None, "error": error}
+
+def run_benchmarks(cases: List[BenchmarkCase] = CORPUS, repeat: int = 3, include_backtracking: bool = True,
+                   log=None) -> List[Dict]:
+    """
+    Runs every applicable (case, configuration) pair and returns one row per pair. The column
+    encoding is skipped on puzzles it does not support; any other failure becomes a row whose
+    `error` holds the message.
+    """
+    rows = []
+    for case in cases:
+        for config, backend, encoding in CONFIGURATIONS:
+            if backend == "backtracking" and not (include_backtracking and case.backtracking):
+                continue
+            if case.search == (backend == "presolve"):
+                continue
+            if encoding == "columns" and not _is_column_case(case):
+                continue
+            try:
+                row = run_case(case, config, backend, encoding, repeat)
+            except Exception as e:
+                row = _error_row(case, config, f"{type(e).__name__}: {e}")
+            rows.append(row)
+            if log and row["error"]:
+                log(f"{case.name:28} {config:16} ERROR {row['error']}")
+            elif log:
+                log(f"{case.name:28} {config:16} {row['total_s'] * 1000:10.2f} ms {row['solutions']:8} solutions")
+    return rows
+
+def compare_to_baseline(rows: List[Dict], baseline: List[Dict], tolerance: float, min_delta: float) -> List[str]:
+    """
+    Returns a message for every row whose total time grew by more than `tolerance` (relative) and
+    `min_delta` seconds (absolute) over the baseline, whose solution count changed or that failed,
+    and for every baseline row the current run does not have.
+    """
+    previous = {(row["case"], row["config"]): row for row in baseline}
+    current = {(row["case"], row["config"]) for row in rows}
+    problems = [f"{case} [{config}]: missing from this run" for case, config in previous if (case, config) not in current]
+    for row in rows:
+        if row.get("error"):
+            problems.append(f"{row['case']} [{row['config']}]: failed with {row['error']}")
+            continue
+        old = previous.get((row["case"], row["config"]))
+        if old is None or old.get("error"):
+            continue
+        if row["solutions"] != old["solutions"]:
+            problems.append(f"{row['case']} [{row['config']}]: {old['solutions']} -> {row['solutions']} solutions")
+        slower = row["total_s"] - old["total_s"]
+        if slower > min_delta and row["total_s"] > old["total_s"] * (1 + tolerance):
+            problems.append(f"{row['case']} [{row['config']}]: {old['total_s'] * 1000:.2f} ms -> "
+                            f"{row['total_s'] * 1000:.2f} ms")
+    return problems
+
+def _environment() -> Dict:
+    from ortools import __version__ as ortools_version
+    return {"python": platform.python_version(), "machine": platform.machine(), "ortools": ortools_version}
+
+def write_json(path: str, rows: List[Dict]):
+    with open(path, "w") as f:
+        json.dump({"environment": _environment(), "results": rows}, f, indent=2)
+
+def write_csv(path: str, rows: List[Dict]):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the cryptarithm solver backends.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--csv", help="Write results as CSV to this path.")
+    parser.add_argument("--baseline", help="Compare against a JSON file written by --output or --save-baseline.")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline to this path.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default 0.25).")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns below this many seconds.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the fastest is kept.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--no-backtracking", action="store_true", help="Skip the backtracking backend.")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CORPUS if args.filter in case.name]
+    rows = run_benchmarks(cases, args.repeat, not args.no_backtracking, log=print)
+
+    if args.output:
+        write_json(args.output, rows)
+    if args.csv:
+        write_csv(args.csv, rows)
+    if args.save_baseline:
+        write_json(args.save_baseline, rows)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        # Only expect the cases and configurations this run was asked for.
+        names = {case.name for case in cases}
+        baseline = [row for row in baseline if row["case"] in names
+                    and not (args.no_backtracking and row["config"] == "backtracking")]
+        problems = compare_to_baseline(rows, baseline, args.tolerance, args.min_delta)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print(f"No regressions against {args.baseline}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
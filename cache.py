@@ -0,0 +1,142 @@
+"""
+This module provides a result cache keyed on puzzle structure.
+Puzzles that only differ in their letters or spacing, such as SEND+MORE=MONEY and
+ABCD+EFGB=EFCBH, share one entry as long as the same letters lead a word; "A BC" makes B a
+leading, non-zero letter where "ABC" does not, so those keys differ. Solutions are stored as
+digit tuples in canonical letter order and mapped back to the caller's letters on a hit.
+"""
+import sqlite3
+import string
+import threading
+from collections import OrderedDict
+from parser import Operation, Word, Number
+from common import _signed_terms
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Bump when the key format or solver semantics change, so stale on-disk entries are ignored.
+KEY_VERSION = 4
+
+def _canonical_name(index: int) -> str:
+    if index < len(string.ascii_uppercase):
+        return string.ascii_uppercase[index]
+    return f"<{index}>"
+
+def _serialize(node: Union[Operation, Word, Number], names: Dict[str, str], order: List[str]) -> str:
+    """Writes an AST back out with letters renamed in first-appearance (in-order) order."""
+    if isinstance(node, Number):
+        return "".join(map(str, node.digits))
+    if isinstance(node, Word):
+        parts = []
+        for element in node.letters:
+            if isinstance(element, str):
+                if element not in names:
+                    names[element] = _canonical_name(len(order))
+                    order.append(element)
+                parts.append(names[element])
+            else:
+                parts.append(str(element))
+        return "".join(parts)
+    if node.op in ('+', '-'):
+        # Chains are written flat, which also spares long sums from deep recursion.
+        terms = [('+' if sign > 0 else '-') + _serialize(term, names, order) for sign, term in _signed_terms(node)]
+        return f"({''.join(terms)[1:]})"
+    left = _serialize(node.left, names, order)
+    right = _serialize(node.right, names, order)
+    if node.op == '=':
+        return f"{left}={right}"
+    return f"({left}{node.op}{right})"
+
+def canonicalize(asts: Sequence[Operation], base: int, constraints: Dict[str, int],
+                 division: str = "exact", first_letters: Iterable[str] = ()) -> Tuple[str, List[str]]:
+    """
+    Returns the cache key for a parsed puzzle and the caller's letters in canonical order.
+    The key covers the structure of every equation, the base, the division semantics, the
+    constraints and the leading letters, which come from the puzzle's spacing rather than its AST.
+    """
+    names, order = {}, []
+    equations = [_serialize(ast, names, order) for ast in asts]
+    fixed = ",".join(f"{names[letter]}={digit}" for letter, digit in sorted(constraints.items(), key=lambda c: names.get(c[0], c[0])))
+    leading = ",".join(sorted(names[letter] for letter in first_letters if letter in names))
+    return f"v{KEY_VERSION}|b{base}|{division}|{';'.join(equations)}|{fixed}|{leading}", order
+
+class SolutionCache:
+    """
+    An in-memory LRU of solved puzzles with an optional SQLite store behind it.
+
+    `max_entries` bounds the number of puzzles held in memory and `max_solutions` bounds the total
+    number of solutions across them; the least recently used entries are evicted first. Puzzles
+    with more than `max_entry_solutions` solutions are not cached at all. With `path`, every entry
+    is also written to a SQLite database so warm hits survive restarts.
+    """
+    def __init__(self, max_entries: int = 1024, max_solutions: int = 1_000_000, max_entry_solutions: int = 100_000,
+                 path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_solutions = max_solutions
+        self.max_entry_solutions = max_entry_solutions
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, width INTEGER, digits BLOB)")
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[List[Tuple[int, ...]]]:
+        """Returns the cached digit tuples for a key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            row = None
+            if self._db is not None:
+                row = self._db.execute("SELECT width, digits FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        width, packed = row
+        solutions = [tuple(packed[i:i + width]) for i in range(0, len(packed), width)] if width else [()] * len(packed)
+        self._remember(key, solutions)
+        return solutions
+
+    def put(self, key: str, solutions: List[Tuple[int, ...]]):
+        """Stores the complete solution set of a puzzle."""
+        if len(solutions) > self.max_entry_solutions:
+            return
+        solutions = [tuple(s) for s in solutions]
+        self._remember(key, solutions)
+        if self._db is not None:
+            width = len(solutions[0]) if solutions else 0
+            # Zero-width solutions (puzzles without letters) are stored as one byte each to keep their count.
+            packed = bytes(d for s in solutions for d in s) if width else bytes(len(solutions))
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)", (key, width, packed))
+                self._db.commit()
+
+    def _remember(self, key: str, solutions: List[Tuple[int, ...]]):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = solutions
+            self._size += len(solutions)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_solutions):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        """Empties the in-memory LRU. The on-disk store is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,189 @@
+"""
+This module provides the puzzle helpers shared by every solver backend: letter collection,
+constraint validation and solution formatting. It must not import any solver library.
+"""
+import re
+import time
+from dataclasses import dataclass
+from parser import parse_multi_puzzle, Operation, Word, Number
+from typing import Dict, Union, Set, List, Optional, Tuple
+
+# "enumerate" lists every solution; "first" stops at one and "unique" looks for a second to
+# prove or refute uniqueness. Only the last two can use CP-SAT's multi-worker portfolio.
+MODES = ("enumerate", "first", "unique")
+
+# "exact" requires every '/' to divide evenly, except that A/B = C/D compares the two fractions.
+# "floor" rounds each quotient down and drops the remainder.
+DIVISIONS = ("exact", "floor")
+
+@dataclass
+class _ParsedPuzzle:
+    """A parsed and validated puzzle, ready to be handed to a solver backend."""
+    puzzles: List[str]
+    asts: List[Operation]
+    all_letters: List[str]
+    first_letters: Set[str]
+    constraints: Dict[str, int]
+    base: int
+    division: str = "exact"
+
+def _int_to_base_digit_char(digit: int) -> str:
+    """Converts a digit to its character representation for bases > 10."""
+    if digit < 10:
+        return str(digit)
+    return chr(ord('A') + digit - 10)
+
+def _get_all_letters(node: Union[Operation, Word, Number]) -> Set[str]:
+    """Traverses the AST with an explicit stack to collect all unique letters."""
+    letters, stack = set(), [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Word):
+            letters.update(l for l in node.letters if isinstance(l, str))
+        elif isinstance(node, Operation):
+            stack.extend((node.left, node.right))
+    return letters
+
+def _signed_terms(node: Union[Operation, Word, Number], sign: int = 1) -> List[Tuple[int, Union[Operation, Word, Number]]]:
+    """
+    Flattens a chain of '+' and '-' into (sign, operand) pairs in reading order, without
+    recursing, so walkers only recurse into the operands. Machine-made sums can have thousands
+    of terms, far deeper than Python's recursion limit as a binary tree.
+    """
+    terms, stack = [], [(sign, node)]
+    while stack:
+        sign, node = stack.pop()
+        if isinstance(node, Operation) and node.op in ('+', '-'):
+            stack.append((sign if node.op == '+' else -sign, node.right))
+            stack.append((sign, node.left))
+        else:
+            terms.append((sign, node))
+    return terms
+
+def _get_first_letters(puzzles: List[str]) -> Set[str]:
+    """Collects the leading letter of every word, which may not be assigned zero."""
+    first_letters = set()
+    for puzzle_string in puzzles:
+        words_in_puzzle = re.findall('[A-Z0-9]+', puzzle_string.upper())
+        for word in words_in_puzzle:
+            if word:
+                if word and word[0].isalpha():
+                    first_letters.add(word[0])
+    return first_letters
+
+def _validate_constraints(all_letters: List[str], first_letters: Set[str], constraints: Dict[str, int], base: int) -> Optional[str]:
+    """Returns an error message if the constraints or the letter count make the puzzle invalid."""
+    if any(l not in all_letters for l in constraints.keys()):
+        return "Invalid constraint: A letter in the constraint is not in the puzzle."
+    if len(set(constraints.values())) != len(constraints.values()):
+        return "Invalid constraint: Digits in constraints must be unique."
+    if any(d >= base for d in constraints.values()):
+        return f"Invalid constraint: A digit is greater than or equal to the base {base}."
+    for letter, digit in constraints.items():
+        if letter in first_letters and digit == 0:
+            return f"Invalid constraint: Letter '{letter}' cannot be zero."
+    if len(all_letters) > base:
+        return f"Too many unique letters for base {base}. The puzzle is unsolvable."
+    return None
+
+def _check_division(division: str):
+    if division not in DIVISIONS:
+        raise ValueError(f"Unknown division '{division}'. Expected one of: {', '.join(DIVISIONS)}.")
+
+def _is_ratio_equation(equation: Operation, division: str) -> bool:
+    """Checks for A/B = C/D, which exact division solves as A*D = B*C without requiring whole quotients."""
+    return (division == "exact" and isinstance(equation.left, Operation) and equation.left.op == '/'
+            and isinstance(equation.right, Operation) and equation.right.op == '/')
+
+def _parse_and_validate(puzzles: Union[str, List[str]], base: int, constraints: Optional[Dict[str, int]],
+                        stats=None, division: str = "exact") -> Tuple[Optional[_ParsedPuzzle], Optional[str]]:
+    """
+    Parses the puzzle strings and checks the constraints against them.
+    Returns the parsed puzzle, or None and the message every backend reports for invalid input.
+    Records the "parse" and "letters" phases when a SolveStats is given.
+    """
+    _check_division(division)
+    if constraints is None:
+        constraints = {}
+
+    if isinstance(puzzles, str):
+        puzzles = [puzzles]
+
+    start = time.perf_counter()
+    try:
+        asts = parse_multi_puzzle(puzzles)
+    except ValueError as e:
+        return None, str(e)
+    parsed_at = time.perf_counter()
+    if stats is not None:
+        stats.add_time("parse", parsed_at - start)
+
+    all_letters = set()
+    for ast in asts:
+        all_letters.update(_get_all_letters(ast))
+    all_letters = sorted(list(all_letters))
+    first_letters = _get_first_letters(puzzles)
+
+    error = _validate_constraints(all_letters, first_letters, constraints, base)
+    if stats is not None:
+        stats.add_time("letters", time.perf_counter() - parsed_at)
+    if error:
+        return None, error
+    return _ParsedPuzzle(puzzles, asts, all_letters, first_letters, constraints, base, division), None
+
+def _format_solution(puzzles: List[str], solution_map: Dict[str, int]) -> str:
+    """Formats a letter-to-digit assignment as the solved puzzle followed by the mapping."""
+    # Create the solved puzzle string
+    from_str = "".join(solution_map.keys())
+    to_str = "".join(map(_int_to_base_digit_char, solution_map.values()))
+    table = str.maketrans(from_str, to_str)
+    solved_puzzle = "\n".join([p.upper().translate(table) for p in puzzles])
+
+    # Create the letter-to-digit mapping string
+    letter_mapping_str = " ".join(sorted([f"{l}={v}" for l, v in solution_map.items()]))
+
+    return f"{solved_puzzle}\n{letter_mapping_str}"
+
+def _is_additive(node: Union[Operation, Word, Number]) -> bool:
+    """Checks whether an expression only combines words and numbers with '+' and '-'."""
+    return all(isinstance(term, (Word, Number)) for _, term in _signed_terms(node))
+
+def _collect_signed_terms(node: Union[Operation, Word, Number], sign: int, base: int, terms: List):
+    """Flattens an additive expression into (sign, digits) pairs, least significant digit first."""
+    for sign, term in _signed_terms(node, sign):
+        if isinstance(term, Word):
+            terms.append((sign, list(reversed(term.letters))))
+            continue
+        # Numbers keep the decimal value used by _build_expression, re-expressed in the puzzle base.
+        value = int("".join(map(str, term.digits)))
+        digits = []
+        while value:
+            value, digit = divmod(value, base)
+            digits.append(digit)
+        terms.append((sign, digits))
+
+def _build_columns(equation: Operation, base: int) -> List:
+    """
+    Splits an additive equation into columns, least significant first.
+    Each column is a (coefficients, constant) pair where coefficients maps a letter to the
+    signed number of times it appears in that column.
+    """
+    terms = []
+    _collect_signed_terms(equation.left, 1, base, terms)
+    _collect_signed_terms(equation.right, -1, base, terms)
+    num_columns = max((len(digits) for _, digits in terms), default=0)
+
+    columns = []
+    for column in range(num_columns):
+        coefficients = {}
+        constant = 0
+        for sign, digits in terms:
+            if column >= len(digits):
+                continue
+            element = digits[column]
+            if isinstance(element, str):
+                coefficients[element] = coefficients.get(element, 0) + sign
+            else:
+                constant += sign * element
+        columns.append((coefficients, constant))
+    return columns
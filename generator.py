@@ -0,0 +1,156 @@
+"""
+This module generates new puzzles by filling an operator template such as "{} + {} = {}" with
+words from a word list, keeping the fillings that have exactly one solution.
+
+    python generator.py words.txt --template "{} + {} = {}" -o puzzles.jsonl --workers 8 --limit 100
+
+Candidates with more letters than the base, or whose sides cannot reach a common value, are
+dropped here without parsing. The rest go to batch.solve_batch with max_solutions=2, so each
+worker presolves the candidate, which rejects most of them at once, and stops the search at
+the second solution.
+"""
+import argparse
+import itertools
+import json
+import string
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from batch import solve_batch
+from parser import Operation, ParseError, Word, Number, parse_puzzle
+
+def read_words(stream) -> List[str]:
+    """Reads whitespace-separated words, upper-cased, keeping the first occurrence of each."""
+    words = (word.upper() for line in stream for word in line.split())
+    return list(dict.fromkeys(word for word in words if word.isalpha()))
+
+class PuzzleTemplate:
+    """
+    An equation with "{}" slots for words, e.g. "{} * {} = {}".
+    Templates may contain numbers and operators but no letters of their own.
+    """
+    def __init__(self, template: str):
+        self.template = template
+        self.slots = template.count("{}")
+        if not self.slots:
+            raise ValueError("A template needs at least one '{}' slot.")
+        if self.slots > len(string.ascii_uppercase) or any(c.isalpha() for c in template.replace("{}", "")):
+            raise ValueError("A template may only contain '{}' slots, numbers and operators.")
+        try:
+            # Slot i is parsed as the one-letter word string.ascii_uppercase[i].
+            self.ast = parse_puzzle(template.format(*string.ascii_uppercase[:self.slots]))
+        except ParseError as e:
+            raise ValueError(f"Invalid template '{template}': {e}") from None
+        self.symmetric_groups = [group for group in (self._symmetric_slots(self.ast.left),
+                                                     self._symmetric_slots(self.ast.right)) if len(group) > 1]
+
+    def _symmetric_slots(self, node) -> List[int]:
+        """Slots that are summed or multiplied together on one side, so their order is irrelevant."""
+        operands, ops = [], set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, Operation):
+                ops.add(current.op)
+                stack.extend((current.left, current.right))
+            elif isinstance(current, Word):
+                operands.append(string.ascii_uppercase.index(current.letters[0]))
+            else:
+                return []
+        return sorted(operands) if len(ops) == 1 and ops <= {'+', '*'} else []
+
+    def fill(self, words: Sequence[str]) -> str:
+        return self.template.format(*words)
+
+    def _range(self, node, lengths: Sequence[int], base: int) -> Optional[Tuple[int, int]]:
+        """Bounds on a side's value from the words' lengths alone, or None where unknown."""
+        if isinstance(node, Number):
+            value = int("".join(map(str, node.digits)))
+            return value, value
+        if isinstance(node, Word):
+            length = lengths[string.ascii_uppercase.index(node.letters[0])]
+            # Leading letters are never zero.
+            return base ** (length - 1), base ** length - 1
+        left = self._range(node.left, lengths, base)
+        right = self._range(node.right, lengths, base)
+        if left is None or right is None or node.op not in ('+', '-', '*'):
+            return None
+        (a, b), (c, d) = left, right
+        if node.op == '+':
+            return a + c, b + d
+        if node.op == '-':
+            return a - d, b - c
+        corners = (a * c, a * d, b * c, b * d)
+        return min(corners), max(corners)
+
+    def may_hold(self, words: Sequence[str], base: int) -> bool:
+        """Cheap necessary conditions: few enough letters, and both sides can reach a common value."""
+        if len(set("".join(words))) > base:
+            return False
+        lengths = [len(word) for word in words]
+        left, right = self._range(self.ast.left, lengths, base), self._range(self.ast.right, lengths, base)
+        return left is None or right is None or (left[0] <= right[1] and right[0] <= left[1])
+
+    def candidates(self, words: Sequence[str], base: int = 10) -> Iterator[str]:
+        """
+        Yields the template filled with every ordered choice of distinct words that passes
+        may_hold(). Words in a symmetric group keep their word-list order, so "A + B" is not
+        also produced as "B + A".
+        """
+        for choice in itertools.permutations(range(len(words)), self.slots):
+            if any(any(choice[i] > choice[j] for i, j in zip(group, group[1:])) for group in self.symmetric_groups):
+                continue
+            filled = [words[i] for i in choice]
+            if self.may_hold(filled, base):
+                yield self.fill(filled)
+
+def generate_puzzles(words: Iterable[str], template: str, base: int = 10, workers: Optional[int] = None,
+                     chunksize: int = 16, timeout: Optional[float] = None, limit: Optional[int] = None,
+                     backend: str = "auto") -> Iterator[Dict]:
+    """
+    Yields {"puzzle", "base", "solution"} for each candidate with exactly one solution, in
+    candidate order, stopping after `limit` puzzles. `timeout` bounds each uniqueness check in
+    seconds; candidates that hit it are skipped, since their uniqueness is unknown.
+    """
+    words = [word.upper() for word in words]
+    candidates = PuzzleTemplate(template).candidates(words, base)
+    items = ({"puzzle": puzzle, "base": base} for puzzle in candidates)
+    found = 0
+    for result in solve_batch(items, workers=workers, chunksize=chunksize, timeout=timeout, max_solutions=2,
+                              backend=backend):
+        if result["status"] == "ok" and result["count"] == 1 and result["complete"]:
+            yield {"puzzle": result["puzzle"], "base": base, "solution": result["solutions"][0]}
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate cryptarithms with a unique solution from a word list.")
+    parser.add_argument("words", help="File with whitespace-separated words, or '-' for stdin.")
+    parser.add_argument("--template", default="{} + {} = {}", help="Equation with '{}' slots for the words.")
+    parser.add_argument("--base", type=int, default=10, help="Number base of the puzzles.")
+    parser.add_argument("-o", "--output", default="-", help="Where to write JSONL puzzles (default: stdout).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--chunksize", type=int, default=16, help="Candidates sent to a worker at a time.")
+    parser.add_argument("--timeout", type=float, default=None, help="Time limit per candidate in seconds.")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many puzzles.")
+    parser.add_argument("--backend", default="auto", choices=["auto", "cp-sat", "backtracking"])
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.words == "-" else open(args.words)
+    try:
+        words = read_words(source)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for puzzle in generate_puzzles(words, args.template, args.base, args.workers, args.chunksize,
+                                       args.timeout, args.limit, args.backend):
+            sink.write(json.dumps(puzzle) + "\n")
+            sink.flush()
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+if __name__ == "__main__":
+    main()
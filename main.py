@@ -1,14 +1,53 @@
+"""
+Command-line entry point.
+
+    python main.py                                     # prompts for the puzzle, constraints and base
+    python main.py "SEND + MORE = MONEY"               # solves the puzzle given as arguments
+    python main.py "WRONG + WRONG = RIGHT" --constraints O=3 --base 10
+    python main.py "ABC + DEF = GHIJ" --base 36 -o solutions.bin --sort   # writes solutions to a file
+
+Only the solver facade is imported at start-up; the backends load once a puzzle is solved.
+"""
+import argparse
+import sys
 import time
-from solver import solve_cryptarithm
+from typing import Dict
+from common import DIVISIONS
+from solver import BACKENDS, solve_cryptarithm
+from spill import FORMATS, enumerate_to_file
+
+def _parse_constraints(text: str) -> Dict[str, int]:
+    """Parses "O=3, R=4" into {"O": 3, "R": 4}; raises ValueError on malformed input."""
+    constraints = {}
+    if text:
+        for part in text.split(','):
+            letter, digit = part.strip().split('=')
+            constraints[letter.strip().upper()] = int(digit)
+    return constraints
+
+def _parse_base(text: str) -> int:
+    base = int(text) if text else 10
+    if not 2 <= base <= 36:
+        raise ValueError(f"Base {base} is not between 2 and 36.")
+    return base
+
+def _print_solutions(solutions):
+    if solutions:
+        for i, solution in enumerate(solutions):
+            print(f"--- Solution {i+1} ---")
+            print(solution)
+            print("-" * (len(f"--- Solution {i+1} ---")))
+    else:
+        print("No solution found")
 
-def main():
+def interactive():
     """
     Main function to run the cryptarithm solver with a custom puzzle.
     """
     print("Enter the cryptarithm equations, one per line.")
     print("The last line of the puzzle should be the final sum.")
     print("Press Enter on an empty line when you are finished.")
-    
+
     puzzles = []
     while True:
         line = input()
@@ -23,20 +62,14 @@ def main():
     constraints_str = input("Enter constraints (e.g., O=3, R=4), or press Enter for none: ")
     base_str = input("Enter the base (default is 10): ")
 
-    constraints = {}
-    if constraints_str:
-        try:
-            for part in constraints_str.split(','):
-                letter, digit = part.strip().split('=')
-                constraints[letter.upper()] = int(digit)
-        except (ValueError, IndexError):
-            print("Invalid constraints format. Please use 'L=D, L=D'. Example: O=3, R=4")
-            return
+    try:
+        constraints = _parse_constraints(constraints_str)
+    except (ValueError, IndexError):
+        print("Invalid constraints format. Please use 'L=D, L=D'. Example: O=3, R=4")
+        return
 
     try:
-        base = int(base_str) if base_str else 10
-        if not 2 <= base <= 36:
-            raise ValueError
+        base = _parse_base(base_str)
     except ValueError:
         print("Invalid base. Please enter an integer between 2 and 36.")
         return
@@ -45,15 +78,60 @@ def main():
     start_time = time.time()
     solutions = solve_cryptarithm(puzzles, base, constraints)
     end_time = time.time()
-    if solutions:
-        for i, solution in enumerate(solutions):
-            print(f"--- Solution {i+1} ---")
-            print(solution)
-            print("-" * (len(f"--- Solution {i+1} ---")))
-    else:
-        print("No solution found")
-    
+    _print_solutions(solutions)
+
     print(f"\nSolved in {end_time - start_time:.4f} seconds.")
 
+def _constraints_argument(text: str) -> Dict[str, int]:
+    try:
+        return _parse_constraints(text)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"invalid constraints '{text}', expected e.g. O=3,R=4") from None
+
+def _base_argument(text: str) -> int:
+    try:
+        return _parse_base(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid base '{text}', expected an integer between 2 and 36") from None
+
+def main(argv=None) -> int:
+    """
+    Solves the puzzle given on the command line, or prompts for one when there are no arguments.
+    Returns 0 if a solution was found and 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Solve a cryptarithm. Without a puzzle, prompts for one.")
+    parser.add_argument("puzzles", nargs="*", help="Equations of the puzzle, e.g. \"SEND + MORE = MONEY\".")
+    parser.add_argument("--base", type=_base_argument, default=10, help="Number base, 2 to 36 (default 10).")
+    parser.add_argument("--constraints", type=_constraints_argument, default={},
+                        help="Fixed letters, e.g. O=3,R=4.")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="Solver engine.")
+    parser.add_argument("--division", choices=DIVISIONS, default="exact",
+                        help="Whether quotients must divide evenly or are rounded down.")
+    parser.add_argument("-o", "--output", help="Write the solutions to this file instead of printing them.")
+    parser.add_argument("--format", choices=FORMATS, default="binary", help="Format of --output.")
+    parser.add_argument("--sort", action="store_true", help="Sort --output by digits, in bounded memory.")
+    args = parser.parse_args(argv)
+
+    if not args.puzzles:
+        interactive()
+        return 0
+
+    if args.output:
+        result = enumerate_to_file(args.puzzles, args.output, args.base, args.constraints, format=args.format,
+                                   sort=args.sort, backend=args.backend, division=args.division)
+        if result.error:
+            print(result.error, file=sys.stderr)
+            return 1
+        print(f"Wrote {result.count} solutions to {result.path}.")
+        return 0 if result.count else 1
+
+    solutions = solve_cryptarithm(args.puzzles, args.base, args.constraints, backend=args.backend,
+                                  division=args.division, compact=True)
+    if solutions.error:
+        print(solutions.error, file=sys.stderr)
+        return 1
+    _print_solutions(solutions.strings() if solutions else [])
+    return 0 if solutions else 1
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
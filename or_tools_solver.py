@@ -1,29 +1,201 @@
 """
 This module provides a cryptarithm solver using Google's OR-Tools CP-SAT solver.
 """
-import re
+import math
+import queue
+import threading
+import time
+from fractions import Fraction
 from ortools.sat.python import cp_model
-from parser import parse_multi_puzzle, Operation, Word, Number, _parse_expression
-from typing import Dict, Union, Set, List
-
-def _int_to_base_digit_char(digit: int) -> str:
-    """Converts a digit to its character representation for bases > 10."""
-    if digit < 10:
-        return str(digit)
-    return chr(ord('A') + digit - 10)
-
-def _get_all_letters(node: Union[Operation, Word, Number]) -> Set[str]:
-    """Recursively traverses the AST to collect all unique letters."""
-    if isinstance(node, Word):
-        return set(l for l in node.letters if isinstance(l, str))
-    if isinstance(node, Operation):
-        return _get_all_letters(node.left) | _get_all_letters(node.right)
-    return set()
-
-def _build_expression(model: cp_model.CpModel, node: Union[Operation, Word, Number], letter_vars: Dict[str, cp_model.IntVar], base: int, bound: int, to_var_func):
-    """Recursively builds a CP-SAT expression from an AST node."""
+from parser import Operation, Word, Number
+from common import (_parse_and_validate, _ParsedPuzzle, _is_additive, _is_ratio_equation, _build_columns,
+                    _signed_terms, MODES)
+from presolve import _run_presolve
+from results import SolutionSet, SolutionStream, SolveStats, _new_stats, _emit_stats
+from typing import Dict, Union, List, Optional, Tuple
+
+ENCODINGS = ("auto", "words", "columns")
+STRATEGIES = ("default", "leading-first")
+
+# CP-SAT only accepts variable domains within half the int64 range.
+MAX_VALUE = (2 ** 63 - 1) // 2
+
+class ValueRangeError(ValueError):
+    """Raised when a puzzle's model needs values beyond the 64-bit integers CP-SAT supports."""
+
+def _new_bounded_var(model: cp_model.CpModel, low: int, high: int, name: str) -> cp_model.IntVar:
+    """Creates a helper variable over [low, high], or raises ValueRangeError if CP-SAT cannot represent it."""
+    if low < -MAX_VALUE or high > MAX_VALUE:
+        raise ValueRangeError(f"The value of '{name}' can reach {high if high > MAX_VALUE else low}, which is "
+                         f"beyond the 64-bit integers CP-SAT supports. Try the backtracking backend.")
+    return model.NewIntVar(low, high, name)
+
+def _to_var(model: cp_model.CpModel, expr, low: int, high: int, name: str):
+    """Returns `expr` as a variable, adding a helper with domain [low, high] for linear expressions."""
+    if isinstance(expr, int):
+        return model.NewConstant(expr)
+    if hasattr(expr, 'Index'):  # It's an IntVar
+        return expr
+    helper_var = _new_bounded_var(model, low, high, name)
+    model.Add(helper_var == expr)
+    return helper_var
+
+def _power_bounds(a: int, b: int, c: int, d: int) -> Tuple[int, int]:
+    """Bounds on x ** y for x in [a, b] and y in [c, d], both non-negative; 0 ** 0 is 1."""
+    a, c = max(a, 0), max(c, 0)
+    bits = MAX_VALUE.bit_length()
+    if a >= 2 and c * (a.bit_length() - 1) > bits:
+        low = MAX_VALUE + 1  # Even the smallest power is out of range.
+    else:
+        low = a ** c if a >= 1 else (0 if d >= 1 else 1)
+    if b <= 1:
+        return low, max(b, 1 if c == 0 else 0)
+    # Larger powers are clipped: _add_pow_constraint only allows exponents that fit the result.
+    high = b ** d if d * b.bit_length() <= bits else MAX_VALUE
+    return low, max(low, high)
+
+def _combine_bounds(op: str, a: int, b: int, c: int, d: int) -> Tuple[int, int]:
+    """Bounds on `x op y` for x in [a, b] and y in [c, d]."""
+    if op == '+':
+        return a + c, b + d
+    if op == '-':
+        return a - d, b - c
+    if op == '*':
+        corners = (a * c, a * d, b * c, b * d)
+        return min(corners), max(corners)
+    if op == '^':
+        return _power_bounds(a, b, c, d)
+    if op == '/':
+        # The divisor is never 0, so its range is split around 0. Floor and exact quotients both
+        # lie within the rounded-out extremes of the rational quotient.
+        quotients = [Fraction(x, y) for x in (a, b) for lo, hi in ((c, min(d, -1)), (max(c, 1), d))
+                     if lo <= hi for y in (lo, hi)]
+        if not quotients:
+            return 0, 0  # The divisor can only be 0, which the model rules out.
+        return math.floor(min(quotients)), math.ceil(max(quotients))
+    raise ValueError(f"Unsupported operator: {op}")
+
+def _value_bounds(model: cp_model.CpModel, node: Union[Operation, Word, Number], letter_vars: Dict[str, cp_model.IntVar],
+                  base: int, memo: Optional[Dict[int, Tuple[int, int]]] = None) -> Tuple[int, int]:
+    """
+    Bounds on a node's value from the letters' domains, without adding anything to the model.
+    `memo` keeps the bounds of every visited node by id, so repeated queries stay linear.
+    """
+    if memo is not None and id(node) in memo:
+        return memo[id(node)]
+    if isinstance(node, Number):
+        value = int("".join(map(str, node.digits)))
+        bounds = value, value
+    elif isinstance(node, Word):
+        low = high = 0
+        for element in node.letters:
+            smallest, largest = _var_bounds(model, letter_vars[element]) if isinstance(element, str) else (element, element)
+            low, high = low * base + smallest, high * base + largest
+        bounds = low, high
+    elif node.op in ('+', '-'):
+        bounds = _sum_bounds([(sign, _value_bounds(model, term, letter_vars, base, memo))
+                              for sign, term in _signed_terms(node)])
+    else:
+        bounds = _combine_bounds(node.op, *_value_bounds(model, node.left, letter_vars, base, memo),
+                                 *_value_bounds(model, node.right, letter_vars, base, memo))
+    if memo is not None:
+        memo[id(node)] = bounds
+    return bounds
+
+def _sum_bounds(terms: List[Tuple[int, Tuple[int, int]]]) -> Tuple[int, int]:
+    """Bounds on a sum of (sign, (low, high)) terms."""
+    low = sum(lo if sign > 0 else -hi for sign, (lo, hi) in terms)
+    high = sum(hi if sign > 0 else -lo for sign, (lo, hi) in terms)
+    return low, high
+
+def _term_caps(cap: Tuple[int, int], terms: List[Tuple[int, Tuple[int, int]]]) -> List[Tuple[int, int]]:
+    """Ranges each term of a sum must lie in for the sum to stay within `cap`: term i is in cap minus the rest."""
+    total_lo, total_hi = _sum_bounds(terms)
+    caps = []
+    for sign, (lo, hi) in terms:
+        own_lo, own_hi = (lo, hi) if sign > 0 else (-hi, -lo)
+        low, high = cap[0] - (total_hi - own_hi), cap[1] - (total_lo - own_lo)
+        caps.append((low, high) if sign > 0 else (-high, -low))
+    return caps
+
+def _child_caps(op: str, cap: Tuple[int, int], a: int, b: int, c: int, d: int):
+    """
+    Ranges the operands of `x op y` must lie in for the result to stay within `cap`, given
+    x in [a, b] and y in [c, d]; None where nothing can be derived cheaply. Sums use _term_caps.
+    """
+    low, high = cap
+    if op == '*' and a >= 1 and c >= 1:
+        # Both factors are positive, so each is at most high divided by the other's minimum.
+        low = max(low, 1)
+        return (-(-low // d), high // c), (-(-low // b), high // a)
+    if op == '/' and a >= 0 and c >= 1 and high >= 0:
+        # A non-negative quotient q of y >= 1 leaves q * y <= x < (q + 1) * y.
+        return (max(low, 0) * c, (high + 1) * d - 1), None
+    if op == '^' and c >= 1 and high >= 0:
+        # x ** y >= x for y >= 1, and y <= log2(high) once x >= 2.
+        return (a, high), (None if a < 2 else (c, max(high.bit_length() - 1, 0)))
+    return None, None
+
+def _add_division(model: cp_model.CpModel, quotient_var, dividend_expr, a: int, b: int, divisor_expr, c: int, d: int,
+                  division: str):
+    """
+    Adds quotient_var == dividend / divisor under the given division semantics.
+    Exact division is quotient * divisor == dividend. Floor division keeps the remainder
+    dividend - quotient * divisor as a linear expression between 0 and the divisor, excluding the divisor.
+    A constant divisor keeps either form linear.
+    """
+    if isinstance(divisor_expr, int):
+        if divisor_expr == 0:
+            model.AddBoolOr([])
+        elif division == "exact":
+            model.Add(dividend_expr == divisor_expr * quotient_var)
+        else:
+            remainder = dividend_expr - divisor_expr * quotient_var
+            model.AddLinearConstraint(remainder, min(0, divisor_expr + 1), max(0, divisor_expr - 1))
+        return
+
+    divisor_var = _to_var(model, divisor_expr, c, d, 'divisor')
+    model.Add(divisor_var != 0)
+    if division == "exact":
+        dividend_var = _to_var(model, dividend_expr, a, b, 'dividend')
+        model.AddMultiplicationEquality(dividend_var, [quotient_var, divisor_var])
+        return
+
+    q_lo, q_hi = _var_bounds(model, quotient_var)
+    product_lo, product_hi = _combine_bounds('*', q_lo, q_hi, c, d)
+    product_var = _new_bounded_var(model, product_lo, product_hi, 'quotient_times_divisor')
+    model.AddMultiplicationEquality(product_var, [quotient_var, divisor_var])
+    remainder = dividend_expr - product_var
+    if c > 0:
+        model.Add(remainder >= 0)
+        model.Add(remainder < divisor_var)
+    elif d < 0:
+        model.Add(remainder <= 0)
+        model.Add(remainder > divisor_var)
+    else:
+        positive = model.NewBoolVar('divisor_positive')
+        model.Add(divisor_var > 0).OnlyEnforceIf(positive)
+        model.Add(remainder >= 0).OnlyEnforceIf(positive)
+        model.Add(remainder < divisor_var).OnlyEnforceIf(positive)
+        model.Add(divisor_var < 0).OnlyEnforceIf(positive.Not())
+        model.Add(remainder <= 0).OnlyEnforceIf(positive.Not())
+        model.Add(remainder > divisor_var).OnlyEnforceIf(positive.Not())
+
+def _build_expression(model: cp_model.CpModel, node: Union[Operation, Word, Number], letter_vars: Dict[str, cp_model.IntVar], base: int,
+                      cap: Optional[Tuple[int, int]] = None, division: str = "exact",
+                      memo: Optional[Dict[int, Tuple[int, int]]] = None):
+    """
+    Recursively builds a CP-SAT expression from an AST node.
+    Returns (expression, low, high), where low and high bound the node's value by interval
+    arithmetic over the letters' domains. Every helper variable gets exactly these bounds. `cap`
+    is the range the equation allows for the node, starting with the other side's range at the
+    root. It is pushed down through '+', '-' and positive products (x + y in cap means x in
+    cap - y), which keeps powers that are unbounded on their own representable wherever they
+    sit. `division` is "exact" or "floor", see common.DIVISIONS. `memo` caches _value_bounds.
+    """
     if isinstance(node, Number):
-        return int("".join(map(str, node.digits)))
+        value = int("".join(map(str, node.digits)))
+        return value, value, value
 
     if isinstance(node, Word):
         linear_expr = 0
@@ -32,135 +204,275 @@ def _build_expression(model: cp_model.CpModel, node: Union[Operation, Word, Numb
                 linear_expr = linear_expr * base + letter_vars[element]
             else: # is an int
                 linear_expr = linear_expr * base + element
-        
-        max_word_val = (base ** len(node.letters)) - 1
-        word_var = model.NewIntVar(0, max_word_val if max_word_val > 0 else 0, "".join(map(str, node.letters)))
+
+        low, high = _value_bounds(model, node, letter_vars, base)
+        word_var = _new_bounded_var(model, low, high, "".join(map(str, node.letters)))
         model.Add(word_var == linear_expr)
-        return word_var
+        return word_var, low, high
+
+    if isinstance(node, Operation) and node.op in ('+', '-'):
+        # The whole '+'/'-' chain is one linear sum, built without recursing along the chain.
+        terms = _signed_terms(node)
+        caps = [None] * len(terms)
+        if cap is not None:
+            memo = {} if memo is None else memo
+            caps = _term_caps(cap, [(sign, _value_bounds(model, term, letter_vars, base, memo)) for sign, term in terms])
+        exprs, signs, term_bounds = [], [], []
+        for (sign, term), term_cap in zip(terms, caps):
+            expr, low, high = _build_expression(model, term, letter_vars, base, term_cap, division, memo)
+            exprs.append(expr)
+            signs.append(sign)
+            term_bounds.append((sign, (low, high)))
+        low, high = _sum_bounds(term_bounds)
+        if cap is not None:
+            low, high = max(low, cap[0]), min(high, cap[1])
+            if low > high:
+                model.AddBoolOr([])
+                high = low
+        if all(isinstance(expr, int) for expr in exprs):
+            return sum(sign * expr for sign, expr in zip(signs, exprs)), low, high
+        return cp_model.LinearExpr.weighted_sum(exprs, signs), low, high
 
     if isinstance(node, Operation):
-        left_expr = _build_expression(model, node.left, letter_vars, base, bound, to_var_func)
-        right_expr = _build_expression(model, node.right, letter_vars, base, bound, to_var_func)
-
-        op_map = {
-            '+': lambda a, b: a + b,
-            '-': lambda a, b: a - b,
-        }
-
-        if node.op in op_map:
-            return op_map[node.op](left_expr, right_expr)
+        left_cap = right_cap = None
+        if cap is not None:
+            memo = {} if memo is None else memo
+            left_cap, right_cap = _child_caps(node.op, cap, *_value_bounds(model, node.left, letter_vars, base, memo),
+                                              *_value_bounds(model, node.right, letter_vars, base, memo))
+        left_expr, a, b = _build_expression(model, node.left, letter_vars, base, left_cap, division, memo)
+        right_expr, c, d = _build_expression(model, node.right, letter_vars, base, right_cap, division, memo)
+        low, high = _combine_bounds(node.op, a, b, c, d)
+        if cap is not None:
+            low, high = max(low, cap[0]), min(high, cap[1])
+            if low > high:
+                # No value fits: the equation cannot hold.
+                model.AddBoolOr([])
+                high = low
 
         if node.op == '*':
-            l_var = to_var_func(left_expr, 'l_mul')
-            r_var = to_var_func(right_expr, 'r_mul')
-            prod_var = model.NewIntVar(-bound * bound, bound * bound, 'prod')
+            if isinstance(left_expr, int) or isinstance(right_expr, int):
+                # A constant factor keeps the product linear.
+                return left_expr * right_expr, low, high
+            l_var = _to_var(model, left_expr, a, b, 'l_mul')
+            r_var = _to_var(model, right_expr, c, d, 'r_mul')
+            prod_var = _new_bounded_var(model, low, high, 'prod')
             model.AddMultiplicationEquality(prod_var, [l_var, r_var])
-            return prod_var
-        
+            return prod_var, low, high
+
         if node.op == '^':
-            base_var = to_var_func(left_expr, 'base_pow')
-            exponent_var = to_var_func(right_expr, 'exponent')
-            pow_var = model.NewIntVar(-bound, bound, 'pow')
+            base_var = _to_var(model, left_expr, a, b, 'base_pow')
+            exponent_var = _to_var(model, right_expr, c, d, 'exponent')
+            pow_var = _new_bounded_var(model, low, high, 'pow')
             # CP-SAT does not have a direct power function, so we use a workaround.
-            # This can be slow if the domain of variables is large.
-            _add_pow_constraint(model, pow_var, base_var, exponent_var, bound)
-            return pow_var
+            _add_pow_constraint(model, pow_var, base_var, exponent_var)
+            return pow_var, low, high
 
-        raise ValueError(f"Unsupported operator: {node.op}")
+        if node.op == '/':
+            quotient_var = _new_bounded_var(model, low, high, 'quotient')
+            _add_division(model, quotient_var, left_expr, a, b, right_expr, c, d, division)
+            return quotient_var, low, high
 
     raise TypeError(f"Unsupported node type: {type(node).__name__}")
 
-def _add_pow_constraint(model: cp_model.CpModel, result_var, base_var, exp_var, bound):
+def _add_column_constraints(model: cp_model.CpModel, equation: Operation, letter_vars: Dict[str, cp_model.IntVar], base: int, name: str):
+    """
+    Adds an additive equation to the model one column at a time.
+    Each column sums its signed digits plus the incoming carry and must equal base times the
+    outgoing carry. Carries get the smallest domain the column can produce, which lets CP-SAT
+    propagate far more strongly than a single linear sum over whole words.
+    """
+    columns = _build_columns(equation, base)
+
+    carry = 0
+    carry_lo = carry_hi = 0
+    for column, (coefficients, constant) in enumerate(columns):
+        column_expr = sum(coef * letter_vars[l] for l, coef in coefficients.items()) + constant + carry
+        if column == len(columns) - 1:
+            model.Add(column_expr == 0)
+            break
+
+        column_lo = sum(min(0, coef * (base - 1)) for coef in coefficients.values()) + constant + carry_lo
+        column_hi = sum(max(0, coef * (base - 1)) for coef in coefficients.values()) + constant + carry_hi
+        carry_lo, carry_hi = -(-column_lo // base), column_hi // base
+        next_carry = model.NewIntVar(carry_lo, carry_hi, f'{name}_carry_{column + 1}')
+        model.Add(column_expr == base * next_carry)
+        carry = next_carry
+
+def _var_bounds(model: cp_model.CpModel, var: cp_model.IntVar):
+    """Returns the smallest and largest value in a variable's domain."""
+    domain = model.Proto().variables[var.Index()].domain
+    return domain[0], domain[len(domain) - 1]
+
+def _integer_root(value: int, n: int) -> int:
+    """Returns the largest r such that r ** n <= value, for value >= 0 and n >= 1."""
+    root = int(round(value ** (1.0 / n)))
+    while root ** n > value:
+        root -= 1
+    while (root + 1) ** n <= value:
+        root += 1
+    return root
+
+def _add_pow_constraint(model: cp_model.CpModel, result_var, base_var, exp_var):
     """
     Adds a constraint result_var == base_var ** exp_var to the model.
     This is a workaround as CP-SAT doesn't directly support exponentiation.
+    Base and exponent must be non-negative. Every exponent value the variables allow gets an
+    indicator literal: 0 and 1 are linear, larger exponents use a chain of multiplications over a
+    copy of the base that is clipped to the values whose power fits the result domain. Exponents
+    whose power exceeds the result for any base >= 2 share one literal that forces the base to 0
+    or 1. Model size therefore grows with log(result domain), not with the domain itself.
     """
-    possible_values = []
-    # This is a simple implementation. A more optimized version might be needed
-    # for larger domains or bounds.
-    for b in range(bound):
-        for e in range(10): # Limit exponent to prevent excessive computation
-            try:
-                res = b ** e
-                if res < bound:
-                    possible_values.append((res, b, e))
-                # Early exit if result exceeds bound, assuming exp is non-negative
-                elif e > 1 and b > 1:
-                    break
-            except OverflowError:
-                break # Exit if power calculation results in an overflow
-    
-    model.AddAllowedAssignments([result_var, base_var, exp_var], possible_values)
+    base_lo, base_hi = _var_bounds(model, base_var)
+    exp_lo, exp_hi = _var_bounds(model, exp_var)
+    _, result_hi = _var_bounds(model, result_var)
+    base_lo, exp_lo = max(base_lo, 0), max(exp_lo, 0)
+    model.Add(base_var >= 0)
+    model.Add(exp_var >= 0)
+    if base_lo > base_hi or exp_lo > exp_hi or result_hi < 0:
+        model.AddBoolOr([])
+        return
+
+    # For any base >= 2, exponents above this push the power past result_hi.
+    max_exp = max(result_hi.bit_length(), 1)
+    exp_literals = []
+    for e in range(exp_lo, min(exp_hi, max_exp) + 1):
+        is_e = model.NewBoolVar(f'exp_is_{e}')
+        exp_literals.append(is_e)
+        model.Add(exp_var == e).OnlyEnforceIf(is_e)
+        if e == 0:
+            model.Add(result_var == 1).OnlyEnforceIf(is_e)
+            continue
+        if e == 1:
+            model.Add(result_var == base_var).OnlyEnforceIf(is_e)
+            continue
+
+        root = min(base_hi, _integer_root(result_hi, e))
+        if root < base_lo:
+            model.Add(is_e == 0)
+            continue
+        clipped_base = model.NewIntVar(base_lo, root, f'pow_base_{e}')
+        model.Add(clipped_base == base_var).OnlyEnforceIf(is_e)
+        model.Add(clipped_base == base_lo).OnlyEnforceIf(is_e.Not())
+        power = clipped_base
+        for k in range(2, e + 1):
+            next_power = model.NewIntVar(base_lo ** k, root ** k, f'pow_{e}_{k}')
+            model.AddMultiplicationEquality(next_power, [power, clipped_base])
+            power = next_power
+        model.Add(result_var == power).OnlyEnforceIf(is_e)
+
+    if exp_hi > max_exp:
+        is_large = model.NewBoolVar('exp_is_large')
+        exp_literals.append(is_large)
+        model.Add(exp_var > max_exp).OnlyEnforceIf(is_large)
+        model.Add(base_var <= 1).OnlyEnforceIf(is_large)
+        model.Add(result_var == base_var).OnlyEnforceIf(is_large)
+
+    model.AddExactlyOne(exp_literals)
 
 class CryptarithmSolutionCallback(cp_model.CpSolverSolutionCallback):
-    """Callback to store all solutions."""
+    """Callback to store all solutions, as digit vectors in a SolutionSet."""
     def __init__(self, letter_vars, puzzles):
         cp_model.CpSolverSolutionCallback.__init__(self)
-        self._letter_vars = letter_vars
-        self._puzzles = puzzles
-        self.solutions = []
+        self._vars = list(letter_vars.values())
+        self.solutions = SolutionSet(puzzles, letter_vars)
 
     def on_solution_callback(self):
-        solution_map = {letter: self.Value(var) for letter, var in self._letter_vars.items()}
-        
-        # Create the solved puzzle string
-        from_str = "".join(solution_map.keys())
-        to_str = "".join(map(_int_to_base_digit_char, solution_map.values()))
-        table = str.maketrans(from_str, to_str)
-        solved_puzzle = "\n".join([p.upper().translate(table) for p in self._puzzles])
-        
-        # Create the letter-to-digit mapping string
-        letter_mapping_str = " ".join(sorted([f"{l}={v}" for l, v in solution_map.items()]))
-        
-        # Combine and store the solution
-        self.solutions.append(f"{solved_puzzle}\n{letter_mapping_str}")
-
-def solve_with_cp_sat(puzzles: Union[str, List[str]], base=10, constraints=None):
+        self.solutions.add([self.Value(var) for var in self._vars])
+
+# Constraint types counted in SolveStats.model; CP-SAT has others, but this module never adds them.
+_CONSTRAINT_KINDS = ("linear", "all_diff", "int_prod", "int_div", "exactly_one", "bool_or", "bool_and", "table")
+
+def _record_model_stats(model: cp_model.CpModel, stats: SolveStats):
+    """Stores the variable and constraint counts of a model, with a count per constraint type."""
+    proto = model.Proto()
+    stats.model["variables"] = len(proto.variables)
+    stats.model["constraints"] = len(proto.constraints)
+    for constraint in proto.constraints:
+        for kind in _CONSTRAINT_KINDS:
+            if getattr(constraint, f"has_{kind}")():
+                stats.model[kind] = stats.model.get(kind, 0) + 1
+                break
+
+def _record_search_stats(solver: cp_model.CpSolver, status, stats: SolveStats):
+    """Stores the status of the last Solve and adds its counters to those of earlier ones."""
+    stats.search["status"] = solver.StatusName(status)
+    for counter, value in (("branches", solver.NumBranches()), ("conflicts", solver.NumConflicts()),
+                           ("wall_time", solver.WallTime())):
+        stats.search[counter] = stats.search.get(counter, 0) + value
+
+def _check_encoding(encoding: str):
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding '{encoding}'. Expected one of: {', '.join(ENCODINGS)}.")
+
+def _check_search_options(mode: str, strategy: str):
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Expected one of: {', '.join(MODES)}.")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}'. Expected one of: {', '.join(STRATEGIES)}.")
+
+def _configure_search(model: cp_model.CpModel, solver: cp_model.CpSolver, letter_vars, parsed: _ParsedPuzzle,
+                      mode: str, num_workers, strategy: str, hints):
     """
-    Solves a cryptarithm puzzle using the CP-SAT solver.
-    Can handle a single puzzle string or a list of puzzle strings for simultaneous equations.
+    Applies the search mode, worker count, branching strategy and value hints to a model and solver.
+    Enumeration runs on a single worker, since CP-SAT cannot enumerate with its parallel portfolio.
     """
-    if constraints is None:
-        constraints = {}
-
-    if isinstance(puzzles, str):
-        puzzles = [puzzles]
-
-    try:
-        asts = parse_multi_puzzle(puzzles)
-    except ValueError as e:
-        return [str(e)]
-
-    # --- 1. Collect letters and identify leading letters from all puzzles ---
-    all_letters = set()
-    for ast in asts:
-        all_letters.update(_get_all_letters(ast))
-    all_letters = sorted(list(all_letters))
-
-    first_letters = set()
-    for puzzle_string in puzzles:
-        words_in_puzzle = re.findall('[A-Z0-9]+', puzzle_string.upper())
-        for word in words_in_puzzle:
-            if word:
-                if word and word[0].isalpha():
-                    first_letters.add(word[0])
-
-    # --- 2. Perform validations ---
-    if any(l not in all_letters for l in constraints.keys()):
-        return ["Invalid constraint: A letter in the constraint is not in the puzzle."]
-    if len(set(constraints.values())) != len(constraints.values()):
-        return ["Invalid constraint: Digits in constraints must be unique."]
-    if any(d >= base for d in constraints.values()):
-        return [f"Invalid constraint: A digit is greater than or equal to the base {base}."]
-    for letter, digit in constraints.items():
-        if letter in first_letters and digit == 0:
-            return [f"Invalid constraint: Letter '{letter}' cannot be zero."]
-    if len(all_letters) > base:
-        return [f"Too many unique letters for base {base}. The puzzle is unsolvable."]
+    if mode == "enumerate":
+        solver.parameters.enumerate_all_solutions = True
+    elif num_workers is not None:
+        # 0 lets CP-SAT use every core.
+        solver.parameters.num_workers = num_workers
+
+    if strategy == "leading-first":
+        # Leading letters are the most constrained digits (non-zero, and they fix each word's magnitude).
+        leading = [letter for letter in parsed.all_letters if letter in parsed.first_letters]
+        others = [letter for letter in parsed.all_letters if letter not in parsed.first_letters]
+        model.AddDecisionStrategy([letter_vars[letter] for letter in leading + others],
+                                  cp_model.CHOOSE_FIRST, cp_model.SELECT_MIN_VALUE)
+        if mode == "enumerate" or num_workers == 1:
+            # A single worker only follows the strategy with fixed search; a portfolio runs it on one worker.
+            solver.parameters.search_branching = cp_model.FIXED_SEARCH
+
+    for letter, digit in (hints or {}).items():
+        letter = letter.upper()
+        if letter not in letter_vars:
+            raise ValueError(f"Hint for unknown letter '{letter}'.")
+        model.AddHint(letter_vars[letter], digit)
+
+def _solve_distinct(model: cp_model.CpModel, solver: cp_model.CpSolver, letter_vars, limit: int,
+                    stats: Optional[SolveStats] = None):
+    """
+    Finds up to `limit` distinct solutions by forbidding each one found and solving again.
+    Returns the letter-to-digit maps and the status of the last Solve, which is INFEASIBLE when
+    no further solution exists.
+    """
+    variables = list(letter_vars.values())
+    found = []
+    while True:
+        status = solver.Solve(model)
+        if stats is not None:
+            _record_search_stats(solver, status, stats)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return found, status
+        found.append({letter: solver.Value(var) for letter, var in letter_vars.items()})
+        if len(found) >= limit:
+            return found, status
+        model.AddForbiddenAssignments(variables, [tuple(found[-1][letter] for letter in letter_vars)])
+
+def _build_model(parsed: _ParsedPuzzle, encoding: str, domains: Optional[Dict[str, List[int]]] = None):
+    """
+    Builds the CP-SAT model for a parsed puzzle and returns it with the letter variables.
+    `domains`, e.g. from the presolve pass, restricts each letter to the listed digits.
+    """
+    puzzles, asts, all_letters = parsed.puzzles, parsed.asts, parsed.all_letters
+    first_letters, constraints, base = parsed.first_letters, parsed.constraints, parsed.base
 
     # --- 3. Create the CP-SAT model and variables ---
     model = cp_model.CpModel()
-    letter_vars = {letter: model.NewIntVar(0, base - 1, letter) for letter in all_letters}
+    if domains is None:
+        letter_vars = {letter: model.NewIntVar(0, base - 1, letter) for letter in all_letters}
+    else:
+        letter_vars = {letter: model.NewIntVarFromDomain(cp_model.Domain.FromValues(domains[letter]), letter)
+                       for letter in all_letters}
 
     # --- 4. Add constraints ---
     if all_letters:
@@ -173,86 +485,247 @@ def solve_with_cp_sat(puzzles: Union[str, List[str]], base=10, constraints=None)
         model.Add(letter_vars[letter] == digit)
 
     # --- 5. Build and add the main arithmetic constraint from the AST ---
-    all_words = []
-    all_numbers = []
-    for puzzle_string in puzzles:
-        all_words.extend(re.findall('[A-Z0-9]+', puzzle_string.upper()))
-        all_numbers.extend(re.findall(r'\d+', puzzle_string))
-    
-    max_word_len = max(len(w) for w in all_words) if all_words else 0
-    max_num_len = max(len(n) for n in all_numbers) if all_numbers else 0
-    max_len = max(max_word_len, max_num_len)
-    bound = base ** (max_len if max_len > 0 else 10)
-
-    def to_var(expr, name):
-        if isinstance(expr, int):
-            const_var = model.NewIntVar(expr, expr, name)
-            return const_var
-        if hasattr(expr, 'Index'):  # It's an IntVar
-            return expr
-        
-        helper_var = model.NewIntVar(-bound, bound, name)
-        model.Add(helper_var == expr)
-        return helper_var
-
     for i, ast in enumerate(asts):
-        if isinstance(ast.left, Operation) and ast.left.op == '/':
-            # Case: A/B = C or A/B = C/D
-            if isinstance(ast.right, Operation) and ast.right.op == '/':
-                # Equation is of the form A/B = C/D, so we solve A*D = B*C
-                a_expr = _build_expression(model, ast.left.left, letter_vars, base, bound, to_var)
-                b_expr = _build_expression(model, ast.left.right, letter_vars, base, bound, to_var)
-                c_expr = _build_expression(model, ast.right.left, letter_vars, base, bound, to_var)
-                d_expr = _build_expression(model, ast.right.right, letter_vars, base, bound, to_var)
-
-                a_var = to_var(a_expr, f'a_{i}')
-                b_var = to_var(b_expr, f'b_{i}')
-                c_var = to_var(c_expr, f'c_{i}')
-                d_var = to_var(d_expr, f'd_{i}')
-
-                prod_bound = bound * bound
-                prod1_var = model.NewIntVar(-prod_bound, prod_bound, f'prod1_{i}')
-                prod2_var = model.NewIntVar(-prod_bound, prod_bound, f'prod2_{i}')
-                
-                model.AddMultiplicationEquality(prod1_var, [a_var, d_var])
-                model.AddMultiplicationEquality(prod2_var, [b_var, c_var])
-                model.Add(prod1_var == prod2_var)
-            else:
-                # Equation is of the form A/B = C, so we solve A = B*C
-                dividend_node = ast.left.left
-                divisor_node = ast.left.right
-                quotient_node = ast.right
-                
-                dividend_expr = _build_expression(model, dividend_node, letter_vars, base, bound, to_var)
-                divisor_expr = _build_expression(model, divisor_node, letter_vars, base, bound, to_var)
-                quotient_expr = _build_expression(model, quotient_node, letter_vars, base, bound, to_var)
-
-                dividend_var = to_var(dividend_expr, f'dividend_{i}')
-                divisor_var = to_var(divisor_expr, f'divisor_{i}')
-                quotient_var = to_var(quotient_expr, f'quotient_{i}')
-
-                model.AddMultiplicationEquality(dividend_var, [divisor_var, quotient_var])
+        if encoding != "words" and _is_additive(ast.left) and _is_additive(ast.right):
+            _add_column_constraints(model, ast, letter_vars, base, f'eq_{i}')
+        elif encoding == "columns":
+            raise ValueError(f"Column encoding only supports '+' and '-', but puzzle '{puzzles[i]}' uses other operators.")
+        elif _is_ratio_equation(ast, parsed.division):
+            # Equation is of the form A/B = C/D, so we solve A*D = B*C
+            a_expr, a_lo, a_hi = _build_expression(model, ast.left.left, letter_vars, base)
+            b_expr, b_lo, b_hi = _build_expression(model, ast.left.right, letter_vars, base)
+            c_expr, c_lo, c_hi = _build_expression(model, ast.right.left, letter_vars, base)
+            d_expr, d_lo, d_hi = _build_expression(model, ast.right.right, letter_vars, base)
+
+            a_var = _to_var(model, a_expr, a_lo, a_hi, f'a_{i}')
+            b_var = _to_var(model, b_expr, b_lo, b_hi, f'b_{i}')
+            c_var = _to_var(model, c_expr, c_lo, c_hi, f'c_{i}')
+            d_var = _to_var(model, d_expr, d_lo, d_hi, f'd_{i}')
+            model.Add(b_var != 0)
+            model.Add(d_var != 0)
+
+            prod1 = (a_lo * d_lo, a_lo * d_hi, a_hi * d_lo, a_hi * d_hi)
+            prod2 = (b_lo * c_lo, b_lo * c_hi, b_hi * c_lo, b_hi * c_hi)
+            # Both products are equal, so each can be limited to where their ranges overlap.
+            low, high = max(min(prod1), min(prod2)), min(max(prod1), max(prod2))
+            if low > high:
+                model.AddBoolOr([])
+                continue
+            prod1_var = _new_bounded_var(model, low, high, f'prod1_{i}')
+            prod2_var = _new_bounded_var(model, low, high, f'prod2_{i}')
+
+            model.AddMultiplicationEquality(prod1_var, [a_var, d_var])
+            model.AddMultiplicationEquality(prod2_var, [b_var, c_var])
+            model.Add(prod1_var == prod2_var)
         else:
-            left_side_expr = _build_expression(model, ast.left, letter_vars, base, bound, to_var)
-            right_side_expr = _build_expression(model, ast.right, letter_vars, base, bound, to_var)
+            # Each side can only take values the other side can reach as well.
+            memo = {}
+            left_lo, left_hi = _value_bounds(model, ast.left, letter_vars, base, memo)
+            right_lo, right_hi = _value_bounds(model, ast.right, letter_vars, base, memo)
+            cap = (max(left_lo, right_lo), min(left_hi, right_hi))
+            if cap[0] > cap[1]:
+                model.AddBoolOr([])
+                continue
+            left_side_expr, _, _ = _build_expression(model, ast.left, letter_vars, base, cap, parsed.division, memo)
+            right_side_expr, _, _ = _build_expression(model, ast.right, letter_vars, base, cap, parsed.division, memo)
             model.Add(left_side_expr == right_side_expr)
 
+    # Individually valid domains can still add up past int64, which CP-SAT also rejects.
+    problem = model.Validate()
+    if problem:
+        raise ValueRangeError(f"The puzzle's values are beyond the 64-bit integers CP-SAT supports ({problem}). "
+                         f"Try the backtracking backend.")
+    return model, letter_vars
+
+def solve_with_cp_sat(puzzles: Union[str, List[str]], base=10, constraints=None, encoding="auto", stats_hook=None,
+                      mode="enumerate", num_workers=None, strategy="default", hints=None, compact=False,
+                      division="exact"):
+    """
+    Solves a cryptarithm puzzle using the CP-SAT solver.
+    Can handle a single puzzle string or a list of puzzle strings for simultaneous equations.
+
+    `encoding` selects how equations are modelled: "words" builds one linear sum over whole
+    word values, "columns" adds pure '+'/'-' equations column by column with carry variables,
+    and "auto" (the default) uses columns wherever the equation allows it.
+    `stats_hook`, if given, is called with a SolveStats describing the solve.
+
+    `mode` is "enumerate" (every solution, the default), "first" (one solution) or "unique"
+    (at most two solutions, so a single result proves uniqueness). The latter two run CP-SAT's
+    parallel portfolio with `num_workers` workers (None keeps CP-SAT's default, 0 uses every core).
+    `strategy="leading-first"` branches on the leading letters first and `hints` maps letters to
+    digits the search should try first.
+
+    With `compact=True` the result is a SolutionSet of digit vectors instead of a list of
+    strings; its strings() method returns the usual list.
+
+    `division="exact"` (the default) only accepts quotients that divide evenly, while "floor"
+    rounds every quotient down; see common.DIVISIONS.
+    """
+    _check_encoding(encoding)
+    _check_search_options(mode, strategy)
+    stats = _new_stats(stats_hook, "cp-sat", encoding)
+
+    # --- 1-2. Parse, collect letters and perform validations ---
+    parsed, error = _parse_and_validate(puzzles, base, constraints, stats, division)
+    if error:
+        _emit_stats(stats, stats_hook)
+        return SolutionSet([puzzles] if isinstance(puzzles, str) else puzzles, (), error) if compact else [error]
+    puzzles = parsed.puzzles
+
+    presolved = _run_presolve(parsed, stats)
+    if presolved.infeasible:
+        if stats is not None:
+            stats.complete = True
+            _emit_stats(stats, stats_hook)
+        solutions = SolutionSet(puzzles, parsed.all_letters)
+        return solutions if compact else solutions.strings()
+
+    # --- 3-5. Build the model ---
+    start = time.perf_counter()
+    model, letter_vars = _build_model(parsed, encoding, presolved.domains)
+    if stats is not None:
+        stats.add_time("build", time.perf_counter() - start)
+        _record_model_stats(model, stats)
+
     # --- 6. Solve the model ---
+    start = time.perf_counter()
     solver = cp_model.CpSolver()
-    solver.parameters.enumerate_all_solutions = True
+    _configure_search(model, solver, letter_vars, parsed, mode, num_workers, strategy, hints)
     solution_callback = CryptarithmSolutionCallback(letter_vars, puzzles)
-    status = solver.Solve(model, solution_callback)
+    if mode == "enumerate":
+        status = solver.Solve(model, solution_callback)
+        if stats is not None:
+            _record_search_stats(solver, status, stats)
+    else:
+        found, status = _solve_distinct(model, solver, letter_vars, 1 if mode == "first" else 2, stats)
+        for solution_map in found:
+            solution_callback.solutions.add(solution_map.values())
+    solutions = solution_callback.solutions.dedupe()
+    if stats is not None:
+        stats.add_time("solve", time.perf_counter() - start)
+        stats.solutions = len(solutions)
+        # Outside enumeration only a failed search for one more solution proves the list complete.
+        exhausted = (cp_model.OPTIMAL, cp_model.INFEASIBLE) if mode == "enumerate" else (cp_model.INFEASIBLE,)
+        stats.complete = status in exhausted
 
     # --- 7. Process and return the solution ---
-    if solution_callback.solutions:
-        return sorted(list(set(solution_callback.solutions)))
+    if compact:
+        _emit_stats(stats, stats_hook)
+        return solutions
+    start = time.perf_counter()
+    result = solutions.strings()
+    if stats is not None:
+        stats.add_time("format", time.perf_counter() - start)
+        _emit_stats(stats, stats_hook)
+    return result
+
+_SEARCH_DONE = object()
+# Seconds between checks for cancellation while a stream waits for the next solution.
+CANCEL_POLL_INTERVAL = 0.05
+
+class StreamingSolutionCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Callback that hands each solution to a consumer thread through a bounded queue.
+    It stops the search once `stop_event` (the consumer has gone) or `cancelled` is set.
+    """
+    def __init__(self, letter_vars, solution_queue: queue.Queue, stop_event: threading.Event, count_only=False,
+                 cancelled: Optional[threading.Event] = None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self._letter_vars = list(letter_vars.values())
+        self._queue = solution_queue
+        self._stop_event = stop_event
+        self._cancelled = cancelled
+        self._count_only = count_only
 
-    if status == cp_model.INFEASIBLE:
-         return ["No solution found"]
-    
-    # Check for validation errors that lead to no solution
-    for letter, digit in constraints.items():
-        if letter in first_letters and digit == 0:
-            return [f"Invalid constraint: Letter '{letter}' cannot be zero."]
+    def stopped(self) -> bool:
+        return self._stop_event.is_set() or (self._cancelled is not None and self._cancelled.is_set())
 
-    return ["No solution found"]
\ No newline at end of file
+    def on_solution_callback(self):
+        item = None if self._count_only else tuple(self.Value(var) for var in self._letter_vars)
+        # A full queue blocks the search until the consumer catches up or stops it.
+        while not self.stopped():
+            try:
+                self._queue.put(item, timeout=0.05)
+                return
+            except queue.Full:
+                pass
+        self.StopSearch()
+
+def _stream_search(model: cp_model.CpModel, letter_vars, count_only: bool, time_limit, queue_size: int,
+                   stats: Optional[SolveStats] = None, cancelled: Optional[threading.Event] = None):
+    """
+    Runs the CP-SAT search in a background thread and yields solutions as they arrive.
+    Returns True if the search was exhaustive; closing the generator or setting `cancelled`
+    stops the search.
+    """
+    solution_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    solver = cp_model.CpSolver()
+    solver.parameters.enumerate_all_solutions = True
+    if time_limit is not None:
+        solver.parameters.max_time_in_seconds = time_limit
+    callback = StreamingSolutionCallback(letter_vars, solution_queue, stop_event, count_only, cancelled)
+    outcome = {}
+
+    def run():
+        try:
+            outcome['status'] = solver.Solve(model, callback)
+            if stats is not None:
+                _record_search_stats(solver, outcome['status'], stats)
+        finally:
+            # Once stopped, the consumer may not be reading; it notices the finished thread instead.
+            while not callback.stopped():
+                try:
+                    solution_queue.put(_SEARCH_DONE, timeout=0.05)
+                    break
+                except queue.Full:
+                    pass
+
+    thread = threading.Thread(target=run, name="cp-sat-search", daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                item = solution_queue.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                if cancelled is not None and cancelled.is_set():
+                    if not thread.is_alive():
+                        break
+                    # Repeated, since a stop requested before Solve() starts is not remembered.
+                    solver.StopSearch()
+                continue
+            if item is _SEARCH_DONE:
+                break
+            yield item
+    finally:
+        stop_event.set()
+        solver.StopSearch()
+        thread.join()
+    return outcome.get('status') in (cp_model.OPTIMAL, cp_model.INFEASIBLE)
+
+def iter_with_cp_sat(puzzles: Union[str, List[str]], base=10, constraints=None, encoding="auto",
+                     max_solutions=None, count_only=False, time_limit=None, queue_size=1024,
+                     collect_stats=False, stats_hook=None, division="exact") -> SolutionStream:
+    """
+    Streams the solutions of a cryptarithm puzzle as CP-SAT finds them.
+    See SolutionStream for the iteration protocol and how early stops are reported.
+    With `collect_stats` or a `stats_hook`, the stream's `stats` attribute is filled in.
+    """
+    _check_encoding(encoding)
+    stats = SolveStats("cp-sat", encoding) if collect_stats else _new_stats(stats_hook, "cp-sat", encoding)
+    parsed, error = _parse_and_validate(puzzles, base, constraints, stats, division)
+    if error:
+        return SolutionStream([puzzles] if isinstance(puzzles, str) else puzzles, [], None, error=error,
+                              stats=stats, stats_hook=stats_hook)
+    presolved = _run_presolve(parsed, stats)
+    if presolved.infeasible:
+        return SolutionStream(parsed.puzzles, parsed.all_letters, None, stats=stats, stats_hook=stats_hook)
+    start = time.perf_counter()
+    model, letter_vars = _build_model(parsed, encoding, presolved.domains)
+    if stats is not None:
+        stats.add_time("build", time.perf_counter() - start)
+        _record_model_stats(model, stats)
+    cancelled = threading.Event()
+    search = _stream_search(model, letter_vars, count_only, time_limit, queue_size, stats, cancelled)
+    return SolutionStream(parsed.puzzles, list(letter_vars), search, max_solutions, count_only,
+                          stats=stats, stats_hook=stats_hook, cancelled=cancelled)
@@ -1,102 +1,161 @@
-import re
 from dataclasses import dataclass
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 
-@dataclass
+# AST nodes are frozen and slotted: no per-node __dict__, and they can be shared and hashed.
+# Sequences are stored as tuples; lists passed to the constructors are converted.
+
+@dataclass(frozen=True, slots=True)
 class Number:
-    digits: List[int]
+    digits: Tuple[int, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "digits", tuple(self.digits))
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Word:
-    letters: List[Union[str, int]]
+    letters: Tuple[Union[str, int], ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "letters", tuple(self.letters))
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Operation:
     op: str
     left: Union[Number, Word, 'Operation']
     right: Union[Number, Word, 'Operation']
 
-def _parse_operand(s: str) -> Union[Word, Number, Operation]:
-    s = s.strip()
-    if s.isdigit():
-        return Number(digits=[int(d) for d in s])
-    elif s.isalnum():
-        elements = [int(c) if c.isdigit() else c for c in s]
-        return Word(letters=elements)
-    # This is where we handle nested expressions by recursively calling the expression parser.
-    elif s.startswith('(') and s.endswith(')'):
-        return _parse_expression(s[1:-1])
-    else:
-        # If it's not a simple word/number or a parenthesis block, it must be a complex expression.
-        return _parse_expression(s)
-
-def _find_rightmost_operator(s: str, operators: List[str]) -> int:
-    """Find the rightmost operator at the top level of an expression."""
-    level = 0
-    for i in range(len(s) - 1, -1, -1):
-        if s[i] == ')':
-            level += 1
-        elif s[i] == '(':
-            level -= 1
-        elif level == 0 and s[i] in operators:
-            return i
-    return -1
-
-def _find_leftmost_operator(s: str, operators: List[str]) -> int:
-    """Find the leftmost operator at the top level of an expression."""
-    level = 0
-    for i in range(len(s)):
-        if s[i] == '(':
-            level += 1
-        elif s[i] == ')':
-            level -= 1
-        elif level == 0 and s[i] in operators:
-            return i
-    return -1
-
-def _parse_expression(s: str) -> Union[Operation, Word, Number]:
-    """Recursively parse an expression respecting operator precedence."""
-    # Addition and Subtraction (lowest precedence)
-    pos = _find_rightmost_operator(s, ['+', '-'])
-    if pos != -1:
-        op = s[pos]
-        left = _parse_expression(s[:pos])
-        right = _parse_expression(s[pos+1:])
-        return Operation(op=op, left=left, right=right)
-
-    # Multiplication and Division (higher precedence)
-    pos = _find_rightmost_operator(s, ['*', '/'])
-    if pos != -1:
-        op = s[pos]
-        left = _parse_expression(s[:pos])
-        right = _parse_expression(s[pos+1:])
-        return Operation(op=op, left=left, right=right)
-
-    # Exponentiation (highest precedence, right-associative)
-    pos = _find_leftmost_operator(s, ['^'])
-    if pos != -1:
-        op = s[pos]
-        left = _parse_expression(s[:pos])
-        right = _parse_expression(s[pos+1:])
-        return Operation(op=op, left=left, right=right)
-        
-    # If no operators, it's a simple operand (Word or Number)
-    return _parse_operand(s)
+# Binding power and associativity of each binary operator; '^' binds tightest and groups to the right.
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
+_RIGHT_ASSOCIATIVE = {'^'}
+# Most operators other than '+' and '-' one path through an expression may nest. Solvers walk
+# '+'/'-' chains iteratively but recurse through everything else.
+MAX_NESTING = 100
+
+class ParseError(ValueError):
+    """A puzzle that cannot be parsed. `position` is the offending character's index in the input."""
+    def __init__(self, message: str, position: Optional[int] = None):
+        super().__init__(message)
+        self.position = position
+
+# A token is (kind, text, position) where kind is "operand", "op", "(", ")" or "end".
+_Token = Tuple[str, str, int]
+
+def _tokenize(s: str, offset: int = 0) -> List[_Token]:
+    """
+    Splits an expression into tokens in a single pass. Whitespace is ignored everywhere, even
+    inside words. Positions are indices into `s` plus `offset`.
+    """
+    tokens = []
+    operand, operand_start = [], 0
+    for i, c in enumerate(s, offset):
+        if c.isspace():
+            continue
+        if c.isalnum():
+            if not operand:
+                operand_start = i
+            operand.append(c)
+            continue
+        if operand:
+            tokens.append(("operand", "".join(operand), operand_start))
+            operand = []
+        if c in _PRECEDENCE:
+            tokens.append(("op", c, i))
+        elif c in "()":
+            tokens.append((c, c, i))
+        else:
+            raise ParseError(f"Unexpected character '{c}' at position {i}.", i)
+    if operand:
+        tokens.append(("operand", "".join(operand), operand_start))
+    tokens.append(("end", "", offset + len(s)))
+    return tokens
+
+def _describe(token: _Token) -> str:
+    kind, text, position = token
+    if kind == "end":
+        return f"end of expression at position {position}"
+    return f"'{text}' at position {position}"
+
+def _make_operand(text: str) -> Union[Word, Number]:
+    if text.isdigit():
+        return Number(digits=tuple(int(d) for d in text))
+    return Word(letters=tuple(int(c) if c.isdigit() else c for c in text))
+
+class _ExpressionParser:
+    """Precedence climbing over a token list; runs in time linear in the number of tokens."""
+    def __init__(self, tokens: List[_Token]):
+        self.tokens = tokens
+        self.index = 0
+
+    def _advance(self) -> _Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def parse(self) -> Union[Operation, Word, Number]:
+        node = self._expression(1)
+        token = self.tokens[self.index]
+        if token[0] != "end":
+            raise ParseError(f"Unexpected {_describe(token)}.", token[2])
+        return node
+
+    def _primary(self) -> Union[Operation, Word, Number]:
+        token = self._advance()
+        kind, text, position = token
+        if kind == "operand":
+            return _make_operand(text)
+        if kind == "(":
+            node = self._expression(1)
+            closing = self._advance()
+            if closing[0] != ")":
+                raise ParseError(f"Expected ')' to close '(' at position {position}, found {_describe(closing)}.",
+                                 closing[2])
+            return node
+        raise ParseError(f"Expected a word, number or '(' but found {_describe(token)}.", position)
+
+    def _expression(self, min_precedence: int) -> Union[Operation, Word, Number]:
+        left = self._primary()
+        while True:
+            kind, op, _ = self.tokens[self.index]
+            if kind != "op" or _PRECEDENCE[op] < min_precedence:
+                return left
+            self.index += 1
+            next_min = _PRECEDENCE[op] if op in _RIGHT_ASSOCIATIVE else _PRECEDENCE[op] + 1
+            left = Operation(op=op, left=left, right=self._expression(next_min))
+
+def _nesting(node: Union[Operation, Word, Number]) -> int:
+    """The most operators other than '+' and '-' on any path from `node`, found without recursing."""
+    deepest, stack = 0, [(node, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, Operation):
+            depth += node.op not in ('+', '-')
+            deepest = max(deepest, depth)
+            stack.extend(((node.left, depth), (node.right, depth)))
+    return deepest
+
+def _parse_expression(s: str, offset: int = 0) -> Union[Operation, Word, Number]:
+    """Parses one side of an equation, respecting operator precedence."""
+    try:
+        node = _ExpressionParser(_tokenize(s, offset)).parse()
+    except RecursionError:
+        raise ParseError("Expression is nested too deeply.") from None
+    if _nesting(node) > MAX_NESTING:
+        raise ParseError(f"Expression is nested too deeply: more than {MAX_NESTING} levels of '*', '/' or '^'.", offset)
+    return node
 
 def parse_puzzle(puzzle_string: str) -> Operation:
     """
     Parses the puzzle string into a full AST.
+    Raises ParseError, a ValueError, with the character position of the problem.
     """
-    puzzle_string = puzzle_string.upper().replace(" ", "")
-    
-    parts = puzzle_string.split('=')
-    if len(parts) != 2:
-        raise ValueError("Puzzle must contain exactly one '='.")
-        
-    left_str, right_str = parts
-    
-    left_expr = _parse_expression(left_str)
-    right_expr = _parse_expression(right_str)
+    puzzle_string = puzzle_string.upper()
+
+    equals = puzzle_string.find('=')
+    if equals == -1 or puzzle_string.find('=', equals + 1) != -1:
+        raise ParseError("Puzzle must contain exactly one '='.")
+
+    left_expr = _parse_expression(puzzle_string[:equals])
+    right_expr = _parse_expression(puzzle_string[equals + 1:], offset=equals + 1)
 
     return Operation(op='=', left=left_expr, right=right_expr)
 
@@ -104,4 +163,4 @@ def parse_multi_puzzle(puzzle_lines: List[str]) -> List[Operation]:
     """
     Parses multiple puzzle lines into a list of ASTs.
     """
-    return [parse_puzzle(line) for line in puzzle_lines]
\ No newline at end of file
+    return [parse_puzzle(line) for line in puzzle_lines]
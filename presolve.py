@@ -0,0 +1,335 @@
+"""
+This module narrows letter domains before any solver runs. It uses interval bounds on both sides
+of every equation, the last digit of each side, and the all-different rule. Puzzles it proves
+infeasible are answered without building a model, and solvers start from the narrowed domains.
+"""
+import math
+import time
+from dataclasses import dataclass, field
+from fractions import Fraction
+from parser import Operation, Word, Number
+from typing import Dict, List, Optional, Set, Tuple, Union
+from common import _parse_and_validate, _ParsedPuzzle, _is_additive, _signed_terms
+
+# Fixpoint rounds over all letters; each round only repeats work if a domain shrank.
+MAX_ROUNDS = 8
+# '^' results above this many bits are treated as unbounded instead of being computed.
+MAX_POWER_BITS = 4096
+
+@dataclass
+class PresolveResult:
+    """
+    Narrowed domains, the reasoning that produced them, and whether the puzzle is infeasible.
+    `derivations` lists every deduction in readable form, e.g. "M = 1 (value bounds of SEND+MORE=MONEY)".
+    """
+    domains: Dict[str, List[int]] = field(default_factory=dict)
+    derivations: List[str] = field(default_factory=list)
+    infeasible: Optional[str] = None
+
+def _number_value(node: Number) -> int:
+    return int("".join(map(str, node.digits)))
+
+class _LinearCheck:
+    """An additive equation as const + sum(coef * letter) == 0, checked by bounds and modulo base."""
+    def __init__(self, equation: Operation, base: int):
+        self.base = base
+        self.coefficients = {}
+        self.constant = 0
+        self._collect(equation.left, 1)
+        self._collect(equation.right, -1)
+        self.coefficients = {letter: c for letter, c in self.coefficients.items() if c}
+        self.letters = list(self.coefficients)
+        # Only the units column constrains the sum modulo base.
+        self.units = {letter: c % base for letter, c in self.coefficients.items() if c % base}
+
+    def _collect(self, node, sign: int):
+        for sign, term in _signed_terms(node, sign):
+            if isinstance(term, Word):
+                for position, element in enumerate(reversed(term.letters)):
+                    weight = sign * self.base ** position
+                    if isinstance(element, str):
+                        self.coefficients[element] = self.coefficients.get(element, 0) + weight
+                    else:
+                        self.constant += weight * element
+            else:
+                self.constant += sign * _number_value(term)
+
+    def _reachable(self, domains: Dict[str, Set[int]], skip: Optional[str] = None) -> Set[int]:
+        """The sums modulo base the units column can reach, leaving out `skip`."""
+        reachable = {self.constant % self.base}
+        for letter, c in self.units.items():
+            if letter != skip:
+                reachable = {(r + c * d) % self.base for r in reachable for d in domains[letter]}
+                if len(reachable) == self.base:
+                    break
+        return reachable
+
+    def _bounds(self, domains: Dict[str, Set[int]], skip: Optional[str] = None) -> Tuple[int, int]:
+        """Bounds on the left-hand sum, leaving out `skip`."""
+        low = high = self.constant
+        for letter, c in self.coefficients.items():
+            if letter != skip:
+                smallest, largest = min(domains[letter]), max(domains[letter])
+                low += c * (smallest if c > 0 else largest)
+                high += c * (largest if c > 0 else smallest)
+        return low, high
+
+    def holds(self, domains: Dict[str, Set[int]]) -> bool:
+        low, high = self._bounds(domains)
+        return low <= 0 <= high and 0 in self._reachable(domains)
+
+    def prune(self, domains: Dict[str, Set[int]], letter: str) -> List[Tuple[int, str]]:
+        """Returns the digits `letter` cannot take, each with the kind of reasoning that excludes it."""
+        c = self.coefficients[letter]
+        low, high = self._bounds(domains, letter)
+        reachable = self._reachable(domains, letter)
+        unit = self.units.get(letter, 0)
+        excluded = []
+        for digit in sorted(domains[letter]):
+            if not low + c * digit <= 0 <= high + c * digit:
+                excluded.append((digit, "value bounds"))
+            elif (-unit * digit) % self.base not in reachable:
+                excluded.append((digit, "last digit"))
+        return excluded
+
+class _TreeCheck:
+    """Any other equation, checked by interval arithmetic and last-digit sets over its AST."""
+    def __init__(self, equation: Operation, base: int):
+        self.equation = equation
+        self.base = base
+        letters = []
+        self._letters(equation, letters)
+        self.letters = list(dict.fromkeys(letters))
+        # Only the last letter of a word changes the residues, and only if neither side uses '/' or '^'.
+        self.unit_letters = set() if self._has_division_or_power(equation) else self._last_letters(equation)
+
+    @staticmethod
+    def _has_division_or_power(node) -> bool:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Operation):
+                if node.op in ('/', '^'):
+                    return True
+                stack.extend((node.left, node.right))
+        return False
+
+    @staticmethod
+    def _last_letters(node) -> Set[str]:
+        letters, stack = set(), [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Operation):
+                stack.extend((node.left, node.right))
+            elif isinstance(node, Word) and isinstance(node.letters[-1], str):
+                letters.add(node.letters[-1])
+        return letters
+
+    def _letters(self, node, letters: List[str]):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Operation):
+                stack.extend((node.right, node.left))
+            elif isinstance(node, Word):
+                letters.extend(element for element in node.letters if isinstance(element, str))
+
+    def _range(self, domains, fixed, digit, element):
+        if not isinstance(element, str):
+            return element, element
+        if element == fixed:
+            return digit, digit
+        return min(domains[element]), max(domains[element])
+
+    def _interval(self, node, domains, fixed, digit):
+        """Returns (low, high) bounds on the node's value; math.inf marks an unbounded side."""
+        if isinstance(node, Number):
+            value = _number_value(node)
+            return value, value
+        if isinstance(node, Word):
+            low = high = 0
+            for element in node.letters:
+                smallest, largest = self._range(domains, fixed, digit, element)
+                low, high = low * self.base + smallest, high * self.base + largest
+            return low, high
+        if node.op in ('+', '-'):
+            low = high = 0
+            for sign, term in _signed_terms(node):
+                a, b = self._interval(term, domains, fixed, digit)
+                if a == -math.inf or b == math.inf:
+                    return -math.inf, math.inf
+                low, high = (low + a, high + b) if sign > 0 else (low - b, high - a)
+            return low, high
+        a, b = self._interval(node.left, domains, fixed, digit)
+        c, d = self._interval(node.right, domains, fixed, digit)
+        if math.inf in (a, b, c, d) or -math.inf in (a, b, c, d):
+            return -math.inf, math.inf
+        if node.op == '*':
+            corners = (a * c, a * d, b * c, b * d)
+            return min(corners), max(corners)
+        if node.op == '/':
+            if c <= 0 <= d:
+                return -math.inf, math.inf
+            corners = (Fraction(a, c), Fraction(a, d), Fraction(b, c), Fraction(b, d))
+            # Floor and exact division both stay within these integer bounds.
+            return math.floor(min(corners)), math.ceil(max(corners))
+        if node.op == '^':
+            if a < 0 or c < 0 or d * max(b, 1).bit_length() > MAX_POWER_BITS:
+                return -math.inf, math.inf
+            # Both operands are non-negative, and 0 ^ 0 is 1 as in the solvers.
+            low = a ** c if a >= 1 else (0 if d >= 1 else 1)
+            high = b ** d if b >= 1 else (1 if c == 0 else 0)
+            return low, high
+        return -math.inf, math.inf
+
+    def _residues(self, node, domains, fixed, digit) -> Optional[Set[int]]:
+        """Returns the possible values of the node modulo base, or None if unknown."""
+        if isinstance(node, Number):
+            return {_number_value(node) % self.base}
+        if isinstance(node, Word):
+            last = node.letters[-1]
+            if not isinstance(last, str):
+                return {last % self.base}
+            return {digit} if last == fixed else set(domains[last])
+        if node.op in ('+', '-'):
+            residues = {0}
+            for sign, term in _signed_terms(node):
+                term_residues = self._residues(term, domains, fixed, digit)
+                if term_residues is None:
+                    return None
+                if len(residues) + len(term_residues) > self.base:
+                    # By pigeonhole, x + y then reaches every residue; the rest of the chain cannot shrink that.
+                    residues = set(range(self.base))
+                else:
+                    residues = {(x + sign * y) % self.base for x in residues for y in term_residues}
+            return residues
+        if node.op != '*':
+            return None
+        left = self._residues(node.left, domains, fixed, digit)
+        right = self._residues(node.right, domains, fixed, digit)
+        if left is None or right is None:
+            return None
+        residues = set()
+        for x in left:
+            residues.update((x * y) % self.base for y in right)
+            if len(residues) == self.base:
+                break
+        return residues
+
+    def _bounds_hold(self, domains, fixed=None, digit=0) -> bool:
+        a, b = self._interval(self.equation.left, domains, fixed, digit)
+        c, d = self._interval(self.equation.right, domains, fixed, digit)
+        return a <= d and c <= b
+
+    def _residue_holds(self, domains, fixed=None, digit=0) -> bool:
+        left = self._residues(self.equation.left, domains, fixed, digit)
+        right = self._residues(self.equation.right, domains, fixed, digit)
+        return left is None or right is None or not left.isdisjoint(right)
+
+    def holds(self, domains) -> bool:
+        return self._bounds_hold(domains) and self._residue_holds(domains)
+
+    def prune(self, domains, letter: str) -> List[Tuple[int, str]]:
+        """
+        Trims the letter's smallest and largest digits while they break the value bounds, so a
+        round costs a few tree walks per letter rather than one per digit. Digits in between are
+        left to the solver. Last letters of words are also probed digit by digit against the
+        last-digit sets.
+        """
+        digits = sorted(domains[letter])
+        excluded = []
+        low, high = 0, len(digits) - 1
+        while low <= high and not self._bounds_hold(domains, letter, digits[low]):
+            excluded.append((digits[low], "value bounds"))
+            low += 1
+        while high > low and not self._bounds_hold(domains, letter, digits[high]):
+            excluded.append((digits[high], "value bounds"))
+            high -= 1
+        if letter in self.unit_letters:
+            excluded.extend((digit, "last digit") for digit in digits[low:high + 1]
+                            if not self._residue_holds(domains, letter, digit))
+        return excluded
+
+def _format_digits(digits) -> str:
+    return "{" + ", ".join(map(str, sorted(digits))) + "}"
+
+def presolve_parsed(parsed: _ParsedPuzzle) -> PresolveResult:
+    """Narrows the domains of a parsed puzzle's letters, or proves the puzzle infeasible."""
+    base = parsed.base
+    domains = {}
+    for letter in parsed.all_letters:
+        if letter in parsed.constraints:
+            domains[letter] = {parsed.constraints[letter]}
+        else:
+            domains[letter] = set(range(1 if letter in parsed.first_letters else 0, base))
+
+    checks = []
+    for puzzle, ast in zip(parsed.puzzles, parsed.asts):
+        additive = _is_additive(ast.left) and _is_additive(ast.right)
+        check = _LinearCheck(ast, base) if additive else _TreeCheck(ast, base)
+        checks.append((puzzle.replace(" ", ""), check))
+
+    result = PresolveResult()
+    removed = {}
+
+    def remove(letter: str, digit: int, reason: str):
+        domains[letter].discard(digit)
+        removed.setdefault((letter, reason), []).append(digit)
+
+    def finish(infeasible: Optional[str] = None) -> PresolveResult:
+        for (letter, reason), digits in removed.items():
+            result.derivations.append(f"{letter} not in {_format_digits(digits)} ({reason})")
+        for letter in parsed.all_letters:
+            if len(domains[letter]) == 1 and letter not in parsed.constraints and not infeasible:
+                result.derivations.append(f"{letter} = {next(iter(domains[letter]))}")
+        result.domains = {letter: sorted(domains[letter]) for letter in parsed.all_letters}
+        result.infeasible = infeasible
+        return result
+
+    for puzzle, check in checks:
+        if not check.letters and not check.holds(domains):
+            return finish(f"{puzzle} does not hold")
+
+    for _ in range(MAX_ROUNDS):
+        changed = False
+        # All different: a letter with a single possible digit takes it from every other letter.
+        for letter in parsed.all_letters:
+            if len(domains[letter]) == 1:
+                digit = next(iter(domains[letter]))
+                for other in parsed.all_letters:
+                    if other != letter and digit in domains[other]:
+                        remove(other, digit, f"all different, {letter} = {digit}")
+                        changed = True
+                        if not domains[other]:
+                            return finish(f"no digit is left for {other}")
+        for puzzle, check in checks:
+            for letter in check.letters:
+                for digit, kind in check.prune(domains, letter):
+                    remove(letter, digit, f"{kind} of {puzzle}")
+                    changed = True
+                if not domains[letter]:
+                    return finish(f"no digit is left for {letter}")
+        if len(set().union(*domains.values())) < len(domains):
+            return finish("fewer digits than letters remain")
+        if not changed:
+            break
+    return finish()
+
+def _run_presolve(parsed: _ParsedPuzzle, stats=None) -> PresolveResult:
+    """Presolves for a backend, recording the "presolve" phase and derivations when a SolveStats is given."""
+    start = time.perf_counter()
+    result = presolve_parsed(parsed)
+    if stats is not None:
+        stats.add_time("presolve", time.perf_counter() - start)
+        stats.presolve = result.derivations + ([f"infeasible: {result.infeasible}"] if result.infeasible else [])
+    return result
+
+def presolve(puzzles: Union[str, List[str]], base: int = 10, constraints: Optional[Dict[str, int]] = None) -> PresolveResult:
+    """
+    Runs the presolve pass on a puzzle and returns what it derived.
+    Invalid puzzles come back with `infeasible` set to the usual validation message.
+    """
+    parsed, error = _parse_and_validate(puzzles, base, constraints)
+    if error:
+        return PresolveResult(infeasible=error)
+    return presolve_parsed(parsed)
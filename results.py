@@ -0,0 +1,255 @@
+"""
+This module provides the result types shared by the solver backends: the streaming iterator and
+the opt-in solve statistics.
+"""
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from common import _format_solution
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+@dataclass
+class SolveStats:
+    """
+    Instrumentation for one solve, collected only when requested.
+
+    `phases` holds seconds spent in "parse", "letters" (letter collection and validation),
+    "presolve", "build" (CP-SAT model construction), "solve" and "format". `model` describes the
+    model size: variable and constraint counts plus a count per constraint type. `search` holds the
+    backend's own counters, e.g. CP-SAT branches, conflicts and wall time, or backtracking nodes.
+    `presolve` lists what the presolve pass derived.
+    """
+    backend: str = ""
+    encoding: Optional[str] = None
+    phases: Dict[str, float] = field(default_factory=dict)
+    model: Dict[str, int] = field(default_factory=dict)
+    search: Dict[str, object] = field(default_factory=dict)
+    presolve: List[str] = field(default_factory=list)
+    solutions: int = 0
+    complete: Optional[bool] = None
+
+    def add_time(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def as_dict(self) -> Dict:
+        return {"backend": self.backend, "encoding": self.encoding, "phases": dict(self.phases),
+                "model": dict(self.model), "search": dict(self.search), "presolve": list(self.presolve),
+                "solutions": self.solutions, "complete": self.complete}
+
+class SolutionSet(Sequence):
+    """
+    A list of solutions stored as one byte per letter rather than as formatted strings.
+
+    Letters are identified by their index in `letters`, and solution i is the digit vector
+    `digits(i)`. Indexing or iterating formats solutions on demand, and strings() returns the
+    solvers' usual list output: the sorted solution strings, the error, or "No solution found".
+    """
+    def __init__(self, puzzles: List[str], letters: Iterable[str], error: Optional[str] = None):
+        self.puzzles = puzzles
+        self.letters = tuple(letters)
+        self.error = error
+        self._digits = bytearray()
+        self._count = 0
+
+    def add(self, digits: Iterable[int]):
+        """Appends one solution given as digits aligned with `letters`."""
+        self._digits.extend(digits)
+        self._count += 1
+
+    def dedupe(self) -> "SolutionSet":
+        """Removes repeated solutions in place, leaving them sorted by digit vector."""
+        width = len(self.letters)
+        if width:
+            rows = sorted({bytes(self._digits[i:i + width]) for i in range(0, len(self._digits), width)})
+            self._digits = bytearray(b"".join(rows))
+            self._count = len(rows)
+        else:
+            self._count = min(self._count, 1)
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored digits."""
+        return len(self._digits)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def digits(self, index: int) -> tuple:
+        if not -self._count <= index < self._count:
+            raise IndexError("solution index out of range")
+        width = len(self.letters)
+        start = (index % self._count) * width
+        return tuple(self._digits[start:start + width])
+
+    def iter_digits(self) -> Iterator[tuple]:
+        for index in range(self._count):
+            yield self.digits(index)
+
+    def as_dict(self, index: int) -> Dict[str, int]:
+        return dict(zip(self.letters, self.digits(index)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        return _format_solution(self.puzzles, self.as_dict(index))
+
+    def strings(self) -> List[str]:
+        """The list the string-returning solver functions produce for these solutions."""
+        if self.error:
+            return [self.error]
+        if not self._count:
+            return ["No solution found"]
+        return sorted(set(self))
+
+_stats_hooks: List[Callable[[SolveStats], None]] = []
+
+def add_stats_hook(hook: Callable[[SolveStats], None]):
+    """Registers a callable that receives the SolveStats of every solve, e.g. to export metrics."""
+    _stats_hooks.append(hook)
+
+def remove_stats_hook(hook: Callable[[SolveStats], None]):
+    _stats_hooks.remove(hook)
+
+def _new_stats(stats_hook, backend: str, encoding: Optional[str] = None) -> Optional[SolveStats]:
+    """Returns a SolveStats if this solve has a hook or a hook is registered globally, else None."""
+    if stats_hook is None and not _stats_hooks:
+        return None
+    return SolveStats(backend=backend, encoding=encoding)
+
+def _emit_stats(stats: Optional[SolveStats], stats_hook=None):
+    if stats is None:
+        return
+    if stats_hook is not None:
+        stats_hook(stats)
+    for hook in list(_stats_hooks):
+        hook(stats)
+
+class SolutionStream:
+    """
+    Iterates over solutions as a backend finds them.
+
+    `search` is a generator owned by a backend. It yields one digit tuple per solution, aligned
+    with `letters` (or None when counting only), and returns True once the search space has been
+    exhausted or False if the backend's time limit stopped it.
+
+    After iteration, `count` holds the number of solutions seen, `complete` tells whether every
+    solution was produced and `stop_reason` is "max_solutions", "time_limit", "cancelled" or
+    "closed" when the search ended early. Stopping at `max_solutions` always counts as early: the
+    search is not continued to find out whether the last solution was also the last one overall. Invalid puzzles produce an empty stream with `error` set.
+    When statistics were requested, `stats` is a SolveStats that is final once the stream has finished.
+
+    `cancelled` is the event the backend's search polls; cancel() sets it from any thread.
+    """
+    def __init__(self, puzzles: List[str], letters: List[str], search: Optional[Iterator], max_solutions=None,
+                 count_only=False, error: Optional[str] = None, stats: Optional[SolveStats] = None, stats_hook=None,
+                 cancelled: Optional[threading.Event] = None):
+        self.puzzles = puzzles
+        self.letters = letters
+        self.max_solutions = max_solutions
+        self.count_only = count_only
+        self.error = error
+        self.count = 0
+        self.complete = True if search is None else None
+        self.stop_reason = None
+        self.stats = stats
+        self._stats_hook = stats_hook
+        self._search = search
+        self._cancelled = cancelled if cancelled is not None else threading.Event()
+        if search is None:
+            self._finish()
+
+    @property
+    def truncated(self) -> bool:
+        """
+        True if the search stopped before it was exhausted. With stop_reason "max_solutions" this only
+        means the limit was reached; there may be no further solutions.
+        """
+        return self.complete is False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        while True:
+            digits = self._next_digits()
+            if not self.count_only:
+                if self.stats is None:
+                    return _format_solution(self.puzzles, dict(zip(self.letters, digits)))
+                start = time.perf_counter()
+                solution = _format_solution(self.puzzles, dict(zip(self.letters, digits)))
+                self.stats.add_time("format", time.perf_counter() - start)
+                return solution
+            # Counting only: keep draining without formatting anything.
+
+    def _next_digits(self):
+        if self._search is not None and self.max_solutions is not None and self.count >= self.max_solutions:
+            self._stop("max_solutions")  # Only reached here when max_solutions is below 1.
+        if self._search is None:
+            raise StopIteration
+        start = time.perf_counter()
+        try:
+            digits = next(self._search)
+        except StopIteration as stop:
+            self._search = None
+            self.complete = bool(stop.value)
+            if not self.complete:
+                self.stop_reason = "cancelled" if self._cancelled.is_set() else "time_limit"
+            self._finish(start)
+            raise StopIteration
+        if self.stats is not None:
+            self.stats.add_time("solve", time.perf_counter() - start)
+        self.count += 1
+        if self.max_solutions is not None and self.count >= self.max_solutions:
+            self._stop("max_solutions")
+        return digits
+
+    def iter_digits(self) -> Iterator[tuple]:
+        """Yields raw digit tuples aligned with `letters` instead of formatted strings."""
+        while True:
+            try:
+                yield self._next_digits()
+            except StopIteration:
+                return
+
+    def _stop(self, reason: str):
+        if self._search is not None:
+            start = time.perf_counter()
+            self._search.close()
+            self._search = None
+            self.complete = False
+            self.stop_reason = reason
+            self._finish(start)
+
+    def _finish(self, solve_start: Optional[float] = None):
+        if self.stats is None:
+            return
+        if solve_start is not None:
+            self.stats.add_time("solve", time.perf_counter() - solve_start)
+        self.stats.solutions = self.count
+        self.stats.complete = self.complete
+        _emit_stats(self.stats, self._stats_hook)
+
+    def close(self):
+        """Stops the underlying search early."""
+        self._stop("closed")
+
+    def cancel(self):
+        """
+        Asks the search to stop. Unlike close(), this is safe to call from another thread while
+        the stream is being iterated: iteration then ends within moments with `stop_reason` "cancelled".
+        """
+        self._cancelled.set()
+
+    def run(self) -> "SolutionStream":
+        """Drains the stream, which is how count_only streams are used, and returns it."""
+        for _ in self:
+            pass
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,224 @@
+"""
+This module runs the solver as a long-lived service, so callers avoid paying the interpreter and
+OR-Tools start-up cost per puzzle. Requests and results are the JSON objects used by batch.py.
+
+    python service.py --http 8080          # POST /solve, GET /health
+    python service.py --stdin              # one JSON request per line in, one result per line out
+"""
+import argparse
+import json
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from batch import HARD_TIMEOUT_GRACE, INVALID_ITEM, _normalize_item, _result, read_jsonl, solve_item
+from solver import BACKENDS
+
+class ServiceBusy(Exception):
+    """Raised when a request arrives while the queue is full."""
+
+class SolverService:
+    """
+    Solves requests on a pool of `workers` threads, with at most `max_queue` further requests
+    waiting. Each request may lower, but not raise, the service's `timeout` (seconds of search
+    per puzzle) and `max_solutions`.
+    """
+    def __init__(self, workers: int = 4, max_queue: int = 64, timeout: Optional[float] = 10.0,
+                 max_solutions: Optional[int] = None):
+        self.timeout = timeout
+        self.max_solutions = max_solutions
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="solver")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._next_id = 0
+
+    @property
+    def pending(self) -> int:
+        """Requests that are queued or being solved."""
+        return self._pending
+
+    def warm_up(self):
+        """Solves a trivial puzzle so the native solver is loaded before the first real request."""
+        solve_item(_normalize_item("A + B = C", 0), timeout=1.0, max_solutions=1, backend="cp-sat")
+
+    def _options(self, request: Dict) -> Dict:
+        timeout, max_solutions = self.timeout, self.max_solutions
+        if request.get("timeout") is not None:
+            timeout = float(request["timeout"]) if timeout is None else min(float(request["timeout"]), timeout)
+        if request.get("max_solutions") is not None:
+            limit = int(request["max_solutions"])
+            max_solutions = limit if max_solutions is None else min(limit, max_solutions)
+        backend = request.get("backend", "auto")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Expected one of: {', '.join(BACKENDS)}.")
+        return {"timeout": timeout, "max_solutions": max_solutions, "backend": backend,
+                "encoding": request.get("encoding", "auto")}
+
+    def submit(self, request, started: Optional[threading.Event] = None) -> Future:
+        """
+        Queues a request (a puzzle string or a dict) and returns a Future of its result dict.
+        `started`, if given, is set when a worker picks the request up.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy("Too many pending requests.")
+        with self._lock:
+            self._pending += 1
+            index, self._next_id = self._next_id, self._next_id + 1
+        try:
+            item = _normalize_item(request, index)
+            options = self._options(request if isinstance(request, dict) else {})
+            future = self._executor.submit(_run, item, options, started)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def solve(self, request) -> Dict:
+        """
+        Solves one request and returns its result, never raising: a full queue, a malformed request
+        or a worker that overruns its time limit is reported through the result's status. The hard
+        limit starts once a worker picks the request up, so time spent queued does not count.
+        """
+        item = _normalize_item(request, None)
+        if item.get("error"):
+            return _result(item, "error", error=item["error"])
+        started = threading.Event()
+        try:
+            future = self.submit(request, started)
+        except ServiceBusy as e:
+            return _result(item, "busy", error=str(e))
+        except Exception as e:
+            return _result(item, "error", error=f"{type(e).__name__}: {e}")
+        # The hard limit runs from when a worker starts the request, not while it waits its turn.
+        future.add_done_callback(lambda _: started.set())
+        started.wait()
+        try:
+            return future.result(timeout=None if self.timeout is None else self.timeout + HARD_TIMEOUT_GRACE)
+        except FutureTimeoutError:
+            future.cancel()
+            return _result(item, "timeout", error="Request exceeded the hard time limit.")
+        except CancelledError:
+            return _result(item, "error", error="The service was closed before the request ran.")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def _run(item: Dict, options: Dict, started: Optional[threading.Event]) -> Dict:
+    if started is not None:
+        started.set()
+    return solve_item(item, **options)
+
+def _handler(service: SolverService):
+    class SolverRequestHandler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: Dict):
+            payload = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "pending": service.pending})
+            else:
+                self._send(404, {"status": "error", "error": f"Unknown path '{self.path}'."})
+
+        def do_POST(self):
+            if self.path != "/solve":
+                self._send(404, {"status": "error", "error": f"Unknown path '{self.path}'."})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+                if not isinstance(request, (str, dict)):
+                    raise ValueError(INVALID_ITEM)
+            except ValueError as e:
+                self._send(400, {"status": "error", "error": f"Invalid request: {e}"})
+                return
+            result = service.solve(request)
+            self._send(503 if result["status"] == "busy" else 200, result)
+
+        def log_message(self, format, *args):
+            pass  # Keep stderr quiet; results carry their own timings.
+
+    return SolverRequestHandler
+
+def serve_http(service: SolverService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Creates the HTTP server; call serve_forever() on it, or shutdown() to stop it."""
+    return ThreadingHTTPServer((host, port), _handler(service))
+
+def serve_stdin(service: SolverService, source=sys.stdin, sink=sys.stdout):
+    """
+    Reads one request per line and writes each result as a JSON line once it is ready, so results
+    may arrive out of input order; match them by "id". Blocks while the queue is full.
+    """
+    write_lock = threading.Lock()
+
+    def write(result: Dict):
+        with write_lock:
+            sink.write(json.dumps(result) + "\n")
+            sink.flush()
+
+    futures = set()
+    for index, request in enumerate(read_jsonl(source)):
+        item = _normalize_item(request, index)
+        if item.get("error"):
+            write(_result(item, "error", error=item["error"]))
+            continue
+        if isinstance(request, str):
+            request = {"puzzle": request}
+        request.setdefault("id", index)
+        while True:
+            try:
+                future = service.submit(request)
+            except ServiceBusy:
+                wait(futures, return_when=FIRST_COMPLETED)
+                futures = {f for f in futures if not f.done()}
+                continue
+            except Exception as e:
+                write(_result(item, "error", error=f"{type(e).__name__}: {e}"))
+            else:
+                future.add_done_callback(lambda f: write(f.result()))
+                futures.add(future)
+            break
+    wait(futures)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the cryptarithm solver as a long-lived JSON service.")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--http", type=int, metavar="PORT", help="Serve POST /solve and GET /health on this port.")
+    mode.add_argument("--stdin", action="store_true", help="Read JSON requests from stdin, write results to stdout.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind in HTTP mode.")
+    parser.add_argument("--workers", type=int, default=4, help="Puzzles solved concurrently.")
+    parser.add_argument("--max-queue", type=int, default=64, help="Requests allowed to wait beyond the workers.")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Maximum search time per request in seconds.")
+    parser.add_argument("--max-solutions", type=int, default=None, help="Maximum solutions returned per request.")
+    args = parser.parse_args(argv)
+
+    service = SolverService(args.workers, args.max_queue, args.timeout, args.max_solutions)
+    service.warm_up()
+    try:
+        if args.stdin:
+            serve_stdin(service)
+        else:
+            server = serve_http(service, args.host, args.http)
+            print(f"Serving on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
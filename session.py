@@ -0,0 +1,117 @@
+"""
+This module provides PuzzleSession, which parses a puzzle and builds its CP-SAT model once and
+then answers any number of queries under different letter constraints, e.g. for interactive hints
+where a user fixes one letter after another.
+"""
+import functools
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from ortools.sat.python import cp_model
+from common import _parse_and_validate, _validate_constraints
+from presolve import presolve_parsed
+from or_tools_solver import _build_model, _check_encoding, _record_model_stats, _record_search_stats, CryptarithmSolutionCallback
+from results import SolutionSet, SolveStats, _new_stats, _emit_stats
+
+# Sessions kept by session_for(); each one holds a parsed puzzle and a built model.
+SESSION_CACHE_SIZE = 128
+
+class PuzzleSession:
+    """
+    A puzzle whose CP-SAT model is built once and re-solved per query.
+
+    Each query's constraints are applied by narrowing the letter variables' domains to the fixed
+    digits, and the original domains are restored afterwards, so nothing is re-parsed or rebuilt.
+    Queries on one session are serialized; use separate sessions to solve concurrently.
+    """
+    def __init__(self, puzzles: Union[str, List[str]], base: int = 10, encoding: str = "auto", division: str = "exact"):
+        _check_encoding(encoding)
+        self.base = base
+        self.encoding = encoding
+        self.division = division
+        self.build_time = 0.0
+        self.presolved = None
+        self._model = None
+        self._lock = threading.Lock()
+        start = time.perf_counter()
+        self._parsed, self.error = _parse_and_validate(puzzles, base, {}, division=division)
+        self.puzzles = self._parsed.puzzles if self._parsed else ([puzzles] if isinstance(puzzles, str) else puzzles)
+        if self._parsed is None:
+            return
+        self.presolved = presolve_parsed(self._parsed)
+        if self.presolved.infeasible:
+            # No constraints can make the puzzle solvable, so there is no model to keep.
+            return
+        self._model, self._letter_vars = _build_model(self._parsed, encoding, self.presolved.domains)
+        variables = self._model.Proto().variables
+        self._domains = {letter: list(variables[var.Index()].domain) for letter, var in self._letter_vars.items()}
+        self.build_time = time.perf_counter() - start
+
+    @property
+    def letters(self) -> List[str]:
+        return self._parsed.all_letters if self._parsed else []
+
+    def _check(self, constraints: Dict[str, int]) -> Optional[str]:
+        if self.error:
+            return self.error
+        return _validate_constraints(self._parsed.all_letters, self._parsed.first_letters, constraints, self.base)
+
+    def _set_domain(self, letter: str, domain: List[int]):
+        proto_domain = self._model.Proto().variables[self._letter_vars[letter].Index()].domain
+        proto_domain.clear()
+        proto_domain.extend(domain)
+
+    def _solve(self, constraints: Dict[str, int], stats: Optional[SolveStats]) -> Tuple[SolutionSet, bool]:
+        """Enumerates the solutions under `constraints` and reports whether the search was exhaustive."""
+        if self._model is None:
+            return SolutionSet(self.puzzles, self.letters), True
+        with self._lock:
+            for letter, digit in constraints.items():
+                self._set_domain(letter, [digit, digit])
+            try:
+                solver = cp_model.CpSolver()
+                solver.parameters.enumerate_all_solutions = True
+                callback = CryptarithmSolutionCallback(self._letter_vars, self.puzzles)
+                status = solver.Solve(self._model, callback)
+            finally:
+                for letter in constraints:
+                    self._set_domain(letter, self._domains[letter])
+        if stats is not None:
+            _record_search_stats(solver, status, stats)
+        return callback.solutions.dedupe(), status in (cp_model.OPTIMAL, cp_model.INFEASIBLE)
+
+    def solve(self, constraints: Optional[Dict[str, int]] = None, compact: bool = False, stats_hook=None):
+        """
+        Returns the solutions under `constraints`, exactly as solve_with_cp_sat would for this
+        puzzle and constraints: a sorted list of strings, or a SolutionSet with `compact=True`.
+        """
+        constraints = constraints or {}
+        error = self._check(constraints)
+        if error:
+            return SolutionSet(self.puzzles, (), error) if compact else [error]
+        stats = _new_stats(stats_hook, "cp-sat", self.encoding)
+        start = time.perf_counter()
+        solutions, complete = self._solve(constraints, stats)
+        if stats is not None:
+            stats.add_time("solve", time.perf_counter() - start)
+            if self._model is not None:
+                _record_model_stats(self._model, stats)
+            stats.solutions, stats.complete = len(solutions), complete
+            _emit_stats(stats, stats_hook)
+        return solutions if compact else solutions.strings()
+
+    def count(self, constraints: Optional[Dict[str, int]] = None) -> int:
+        """Returns the number of solutions under `constraints`, or 0 if they are invalid."""
+        constraints = constraints or {}
+        if self._check(constraints):
+            return 0
+        return len(self._solve(constraints, None)[0])
+
+@functools.lru_cache(maxsize=SESSION_CACHE_SIZE)
+def _cached_session(puzzles: Tuple[str, ...], base: int, encoding: str, division: str) -> PuzzleSession:
+    return PuzzleSession(list(puzzles), base, encoding, division)
+
+def session_for(puzzles: Union[str, List[str]], base: int = 10, encoding: str = "auto",
+                division: str = "exact") -> PuzzleSession:
+    """Returns a shared PuzzleSession for the puzzle, building it on first use."""
+    return _cached_session((puzzles,) if isinstance(puzzles, str) else tuple(puzzles), base, encoding, division)
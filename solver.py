@@ -1,12 +1,133 @@
-from or_tools_solver import solve_with_cp_sat
+"""
+This module is the entry point shared by the CLI, batch solving and the service. The backends are
+imported on first use, so importing it stays cheap: OR-Tools is only loaded once a puzzle
+actually goes to CP-SAT, and NumPy once one goes to the backtracking engine.
+"""
+from common import _parse_and_validate, MODES
+from results import SolutionSet, _new_stats, _emit_stats
 
-def solve_cryptarithm(puzzles, base=10, constraints=None):
+BACKENDS = ("auto", "cp-sat", "backtracking")
+
+def _choose_backend(puzzles, base, constraints, encoding, backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of: {', '.join(BACKENDS)}.")
+    if backend == "auto":
+        from backtracking_solver import prefers_backtracking
+        return "backtracking" if encoding == "auto" and prefers_backtracking(puzzles, base, constraints) else "cp-sat"
+    return backend
+
+def solve_cryptarithm(puzzles, base=10, constraints=None, encoding="auto", backend="auto", cache=None, stats_hook=None,
+                      mode="enumerate", num_workers=None, strategy="default", hints=None, compact=False,
+                      division="exact"):
     """
     Solves a cryptarithm puzzle.
-    This function now acts as a simple wrapper around the CP-SAT solver.
+    `backend` selects the engine: "cp-sat" builds an OR-Tools model, "backtracking" uses the
+    pure-Python/NumPy search, and "auto" (the default) sends small puzzles to backtracking and
+    everything else to CP-SAT, falling back to backtracking when the CP-SAT model would need values
+    beyond 64 bits. `encoding` only applies to the CP-SAT backend.
+    With a cache.SolutionCache as `cache`, puzzles with the same structure are solved only once.
+    `stats_hook`, if given, receives a results.SolveStats with phase timings and solver counters.
+
+    `mode="first"` returns a single solution and `mode="unique"` at most two, so that one result
+    proves the solution is unique. On CP-SAT these modes run the multi-worker portfolio; see
+    solve_with_cp_sat for `num_workers`, `strategy` and `hints`, which only apply there. The cache
+    is only used when enumerating.
+
+    The result is a sorted list of solution strings, or with `compact=True` a results.SolutionSet
+    that stores each solution as a digit vector and formats it only on access.
+
+    `division="exact"` requires every '/' to divide evenly and `division="floor"` rounds quotients
+    down, discarding the remainder.
     """
-    return solve_with_cp_sat(
-        puzzles,
-        base=base,
-        constraints=constraints
-    )
\ No newline at end of file
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Expected one of: {', '.join(MODES)}.")
+    if cache is not None and mode == "enumerate":
+        return _solve_cached(puzzles, base, constraints, encoding, backend, cache, stats_hook, compact, division)
+    chosen = _choose_backend(puzzles, base, constraints, encoding, backend)
+    if chosen == "backtracking":
+        from backtracking_solver import solve_with_backtracking, iter_with_backtracking
+        if mode != "enumerate":
+            stream = iter_with_backtracking(puzzles, base=base, constraints=constraints,
+                                            max_solutions=1 if mode == "first" else 2, stats_hook=stats_hook,
+                                            division=division)
+            solutions = SolutionSet(stream.puzzles, stream.letters, stream.error)
+            for digits in stream.iter_digits():
+                solutions.add(digits)
+            return solutions if compact else solutions.strings()
+        return solve_with_backtracking(puzzles, base=base, constraints=constraints, stats_hook=stats_hook,
+                                       compact=compact, division=division)
+    from or_tools_solver import solve_with_cp_sat, ValueRangeError
+    try:
+        return solve_with_cp_sat(
+            puzzles,
+            base=base,
+            constraints=constraints,
+            encoding=encoding,
+            stats_hook=stats_hook,
+            mode=mode,
+            num_workers=num_workers,
+            strategy=strategy,
+            hints=hints,
+            compact=compact,
+            division=division
+        )
+    except ValueRangeError:
+        if backend != "auto":
+            raise
+    # CP-SAT's interval bounds can overshoot 64 bits even when the values never do.
+    return solve_cryptarithm(puzzles, base=base, constraints=constraints, backend="backtracking",
+                             stats_hook=stats_hook, mode=mode, compact=compact, division=division)
+
+def iter_solutions(puzzles, base=10, constraints=None, encoding="auto", backend="auto",
+                   max_solutions=None, count_only=False, time_limit=None, collect_stats=False, stats_hook=None,
+                   division="exact"):
+    """
+    Yields solutions as the chosen backend finds them, instead of collecting a sorted list.
+    `max_solutions` stops after that many solutions, `count_only` skips formatting entirely
+    (drain the stream with .run() and read .count) and `time_limit` bounds the search in seconds.
+    The returned SolutionStream reports whether the search was complete or truncated, and with
+    `collect_stats` or a `stats_hook` carries a results.SolveStats once it has finished.
+    """
+    chosen = _choose_backend(puzzles, base, constraints, encoding, backend)
+    if chosen == "cp-sat":
+        from or_tools_solver import iter_with_cp_sat, ValueRangeError
+        try:
+            return iter_with_cp_sat(puzzles, base=base, constraints=constraints, encoding=encoding,
+                                    max_solutions=max_solutions, count_only=count_only, time_limit=time_limit,
+                                    collect_stats=collect_stats, stats_hook=stats_hook, division=division)
+        except ValueRangeError:
+            if backend != "auto":
+                raise
+    from backtracking_solver import iter_with_backtracking
+    return iter_with_backtracking(puzzles, base=base, constraints=constraints, max_solutions=max_solutions,
+                                  count_only=count_only, time_limit=time_limit, collect_stats=collect_stats,
+                                  stats_hook=stats_hook, division=division)
+
+def _solve_cached(puzzles, base, constraints, encoding, backend, cache, stats_hook=None, compact=False,
+                  division="exact"):
+    """Looks the puzzle's canonical form up in the cache and solves it only on a miss."""
+    from cache import canonicalize
+    parsed, error = _parse_and_validate(puzzles, base, constraints, division=division)
+    if error:
+        return SolutionSet([puzzles] if isinstance(puzzles, str) else puzzles, (), error) if compact else [error]
+    key, letters = canonicalize(parsed.asts, base, parsed.constraints, division, parsed.first_letters)
+
+    digits = cache.get(key)
+    if digits is None:
+        stream = iter_solutions(parsed.puzzles, base=base, constraints=parsed.constraints, encoding=encoding,
+                                backend=backend, stats_hook=stats_hook, division=division)
+        position = {letter: i for i, letter in enumerate(stream.letters)}
+        index = [position[letter] for letter in letters]
+        digits = [tuple(solution[i] for i in index) for solution in stream.iter_digits()]
+        if stream.complete:
+            cache.put(key, digits)
+    else:
+        stats = _new_stats(stats_hook, "cache")
+        if stats is not None:
+            stats.solutions, stats.complete = len(digits), True
+            _emit_stats(stats, stats_hook)
+
+    solutions = SolutionSet(parsed.puzzles, letters)
+    for d in digits:
+        solutions.add(d)
+    return solutions if compact else solutions.strings()
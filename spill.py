@@ -0,0 +1,178 @@
+"""
+This module enumerates solutions straight to a file, for puzzles with too many solutions to hold
+in memory, e.g. base-36 puzzles with many free letters.
+
+    result = enumerate_to_file("ABC + DEF = GHIJ", "solutions.bin", base=36, sort=True)
+    for solution in read_solutions("solutions.bin"):
+        ...
+
+The "binary" format is a short header followed by one byte per letter per solution, so a
+million solutions of a 10-letter puzzle take 10 MB. The "jsonl" format writes one object per
+solution mapping letters to digits.
+
+Both backends produce every assignment once: CP-SAT enumerates distinct assignments of all
+model variables, and every helper variable (carries, products, quotients) is fixed by the
+letters. Unsorted output is therefore written as it arrives, in constant memory. Sorted output
+goes through runs of at most `run_size` solutions, each sorted and deduplicated by hashing in
+memory and spilled to a temporary file, then merged; rows repeated across runs are dropped
+during the merge.
+"""
+import heapq
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+from solver import iter_solutions
+
+FORMATS = ("binary", "jsonl")
+# First line of a binary solution file; the second is a JSON header and the third the row count.
+BINARY_MAGIC = b"CRYPTARITHM-SOLUTIONS 1\n"
+# Solutions held in memory per sorted run.
+RUN_SIZE = 1_000_000
+# Run files merged at once; more runs are merged in several passes.
+MERGE_FAN_IN = 64
+_COUNT_FORMAT = b"%020d\n"
+
+@dataclass
+class SpillResult:
+    """
+    What enumerate_to_file wrote. `count` is the number of solutions in the file, and
+    `complete` and `stop_reason` are those of the underlying SolutionStream.
+    """
+    path: str
+    format: str
+    letters: List[str]
+    count: int = 0
+    complete: Optional[bool] = None
+    stop_reason: Optional[str] = None
+    error: Optional[str] = None
+
+class _SolutionWriter:
+    """Writes digit rows to a solution file in either format."""
+    def __init__(self, path: str, format: str, puzzles: List[str], letters: List[str], base: int):
+        self.format = format
+        self.letters = letters
+        self.count = 0
+        self._file = open(path, "wb")
+        if format == "binary":
+            header = {"puzzles": puzzles, "letters": letters, "base": base}
+            self._file.write(BINARY_MAGIC + json.dumps(header).encode() + b"\n")
+            self._count_offset = self._file.tell()
+            self._file.write(_COUNT_FORMAT % 0)
+
+    def write(self, row: bytes):
+        if self.format == "binary":
+            self._file.write(row)
+        else:
+            self._file.write(json.dumps(dict(zip(self.letters, row))).encode() + b"\n")
+        self.count += 1
+
+    def close(self):
+        if self.format == "binary":
+            # Patched at the end, since a stream's length is only known once it is drained.
+            self._file.seek(self._count_offset)
+            self._file.write(_COUNT_FORMAT % self.count)
+        self._file.close()
+
+def _read_rows(path: str, width: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            row = f.read(width)
+            if len(row) < width or not width:
+                return
+            yield row
+
+def _write_run(rows: Iterable[bytes], directory: str, index: int) -> str:
+    path = os.path.join(directory, f"run-{index}.bin")
+    with open(path, "wb") as f:
+        for row in rows:
+            f.write(row)
+    return path
+
+def _unique(rows: Iterable[bytes]) -> Iterator[bytes]:
+    """Drops adjacent repeats from sorted rows."""
+    previous = None
+    for row in rows:
+        if row != previous:
+            yield row
+            previous = row
+
+def _merge_runs(runs: List[str], width: int, directory: str) -> Iterator[bytes]:
+    """Merges sorted run files into one sorted, duplicate-free sequence of rows."""
+    index = len(runs)
+    while len(runs) > MERGE_FAN_IN:
+        group, runs = runs[:MERGE_FAN_IN], runs[MERGE_FAN_IN:]
+        runs.append(_write_run(_unique(heapq.merge(*(_read_rows(run, width) for run in group))), directory, index))
+        index += 1
+        for run in group:
+            os.remove(run)
+    return _unique(heapq.merge(*(_read_rows(run, width) for run in runs)))
+
+def _sorted_rows(rows: Iterable[bytes], width: int, run_size: int, directory: str) -> Iterator[bytes]:
+    """Sorts and deduplicates rows in memory runs of at most `run_size`, spilling runs to `directory`."""
+    if not width:
+        # Puzzles without letters have at most one, empty, solution.
+        return iter(set(rows))
+    runs, buffer = [], set()
+    for row in rows:
+        buffer.add(row)
+        if len(buffer) >= run_size:
+            runs.append(_write_run(sorted(buffer), directory, len(runs)))
+            buffer = set()
+    if not runs:
+        return iter(sorted(buffer))
+    if buffer:
+        runs.append(_write_run(sorted(buffer), directory, len(runs)))
+    return _merge_runs(runs, width, directory)
+
+def enumerate_to_file(puzzles: Union[str, List[str]], path: str, base: int = 10, constraints: Optional[Dict[str, int]] = None,
+                      format: str = "binary", sort: bool = False, run_size: int = RUN_SIZE,
+                      temp_dir: Optional[str] = None, **options) -> SpillResult:
+    """
+    Writes every solution of the puzzle to `path` and returns a SpillResult.
+
+    With `sort=True` the file is ordered by digit vector, as SolutionSet.dedupe() orders it, and
+    memory stays bounded by `run_size` solutions; the sorted runs go to a temporary directory
+    inside `temp_dir`. `options` are passed to solver.iter_solutions, e.g. backend, encoding,
+    max_solutions, time_limit or division. Invalid puzzles write no file and set `error`.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format '{format}'. Expected one of: {', '.join(FORMATS)}.")
+    if run_size < 1:
+        raise ValueError("run_size must be at least 1.")
+    stream = iter_solutions(puzzles, base=base, constraints=constraints, **options)
+    result = SpillResult(path, format, list(stream.letters))
+    if stream.error:
+        result.error, result.complete = stream.error, stream.complete
+        return result
+
+    rows = (bytes(digits) for digits in stream.iter_digits())
+    writer = _SolutionWriter(path, format, stream.puzzles, result.letters, base)
+    try:
+        if sort:
+            with tempfile.TemporaryDirectory(prefix="cryptarithm-runs-", dir=temp_dir) as directory:
+                for row in _sorted_rows(rows, len(result.letters), run_size, directory):
+                    writer.write(row)
+        else:
+            for row in rows:
+                writer.write(row)
+    finally:
+        stream.close()
+        writer.close()
+    result.count, result.complete, result.stop_reason = writer.count, stream.complete, stream.stop_reason
+    return result
+
+def read_solutions(path: str) -> Iterator[Dict[str, int]]:
+    """Yields the solutions in a file written by enumerate_to_file, as letter-to-digit dicts."""
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            f.seek(0)
+            for line in f:
+                yield json.loads(line)
+            return
+        letters = json.loads(f.readline())["letters"]
+        count = int(f.readline())
+        width = len(letters)
+        for _ in range(count):
+            yield dict(zip(letters, f.read(width)))
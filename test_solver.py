@@ -1,5 +1,29 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from solver import solve_cryptarithm
+import unittest.mock
+import urllib.request
+from async_solver import AsyncSolver
+from batch import read_jsonl, solve_batch
+from generator import PuzzleTemplate, generate_puzzles
+from main import main
+from benchmark import BenchmarkCase, compare_to_baseline, run_benchmarks
+from cache import SolutionCache, canonicalize
+from parser import Number, Operation, ParseError, Word, parse_puzzle
+from presolve import presolve
+from results import add_stats_hook, remove_stats_hook
+from service import SolverService, serve_http, serve_stdin
+from session import PuzzleSession, session_for
+from solver import solve_cryptarithm, iter_solutions
+from spill import FORMATS, enumerate_to_file, read_solutions
 
 class TestCryptarithmSolver(unittest.TestCase):
 
@@ -71,5 +95,407 @@ class TestCryptarithmSolver(unittest.TestCase):
         solutions = solve_cryptarithm("EVE/DID=TALK/9999")
         self.assertIn("212/606=3498/9999\nA=4 D=6 E=2 I=0 K=8 L=9 T=3 V=1", solutions)
         self.assertIn("242/303=7986/9999\nA=9 D=3 E=2 I=0 K=6 L=8 T=7 V=4", solutions)
+
+    def test_parser_precedence_and_associativity(self):
+        a, b, c, d = (Word([letter]) for letter in "ABCD")
+        self.assertEqual(parse_puzzle("A - B - C = D"), Operation('=', Operation('-', Operation('-', a, b), c), d))
+        self.assertEqual(parse_puzzle("A ^ B ^ C = D"), Operation('=', Operation('^', a, Operation('^', b, c)), d))
+        self.assertEqual(parse_puzzle("(A + B) * 12 = D"),
+                         Operation('=', Operation('*', Operation('+', a, b), Number([1, 2])), d))
+        long_sum = parse_puzzle("+".join(["AB"] * 3000) + "=C")
+        self.assertEqual(long_sum.left.right, Word(['A', 'B']))
+
+    def test_long_sums_are_solved_without_recursing(self):
+        puzzle = "+".join(["A", "B"] * 750) + "=CDEF"
+        expected = solve_cryptarithm(puzzle, backend="backtracking")
+        self.assertEqual(len(expected), 6)
+        self.assertEqual(solve_cryptarithm(puzzle, backend="cp-sat"), expected)
+        self.assertEqual(solve_cryptarithm(puzzle, backend="cp-sat", encoding="words"), expected)
+        self.assertEqual(solve_cryptarithm(puzzle, cache=SolutionCache()), expected)
+        mixed = "-".join(["AB", "C"] * 400) + "+DEFGH=IJ"
+        self.assertEqual(solve_cryptarithm(mixed, backend="cp-sat", encoding="words"),
+                         solve_cryptarithm(mixed, backend="backtracking"))
+        self.assertEqual(solve_cryptarithm("*".join(["A"] * 150) + "=B"),
+                         ["Expression is nested too deeply: more than 100 levels of '*', '/' or '^'."])
+
+    def test_ast_nodes_are_frozen(self):
+        ast = parse_puzzle("AB + 12 = C")
+        self.assertEqual(ast.left.left.letters, ('A', 'B'))
+        self.assertEqual(hash(ast), hash(parse_puzzle("AB+12=C")))
+        with self.assertRaises(AttributeError):
+            ast.op = '+'
+
+    def test_parser_errors_report_positions(self):
+        for puzzle, position in [("A + % = B", 4), ("A + B = C + ", 12), ("(A + B = C", 7), ("A + B) = C", 5)]:
+            with self.assertRaises(ParseError) as raised:
+                parse_puzzle(puzzle)
+            self.assertEqual(raised.exception.position, position, puzzle)
+            self.assertIn(f"position {position}", str(raised.exception))
+        self.assertEqual(solve_cryptarithm("A + B ="), ["Expected a word, number or '(' but found end of expression at position 7."])
+
+    def test_column_and_word_encodings_agree(self):
+        for puzzle, base in [("THIS + ISA + GREAT + TIME = WASTER", 10), ("WRONG + WRONG = RIGHT", 10),
+                             ("GREEN - BLUE = ORANGE", 16), ("SEND + MORE - 10 = MONEY - 10", 10)]:
+            words = solve_cryptarithm(puzzle, base=base, encoding="words")
+            columns = solve_cryptarithm(puzzle, base=base, encoding="columns")
+            self.assertEqual(words, columns)
+
+    def test_column_encoding_rejects_multiplication(self):
+        with self.assertRaises(ValueError):
+            solve_cryptarithm("ABCD * 9 = DCBA", encoding="columns")
+
+    def test_backends_agree(self):
+        for puzzle, base, constraints in [("SEND + MORE = MONEY", 10, {}), ("ABCD * 9 = DCBA", 10, {}),
+                                          ("WRONG + WRONG = RIGHT", 10, {}), ("A * B = CDE", 10, {}),
+                                          ("EVE/DID=TALK/9999", 10, {}), ("AB/C=DE", 10, {}), ("A/B=C/D", 10, {}),
+                                          ("A^B^C=D", 10, {}), (["A+B=C", "A*B=C"], 10, {}),
+                                          ("GREEN - BLUE = ORANGE", 16, {})]:
+            cp_sat = solve_cryptarithm(puzzle, base=base, constraints=constraints, backend="cp-sat")
+            backtracking = solve_cryptarithm(puzzle, base=base, constraints=constraints, backend="backtracking")
+            self.assertEqual(cp_sat, backtracking)
+
+    def test_division_anywhere_in_the_tree(self):
+        for puzzle in ("(A*B)/C+D=EF", "A/B+C/D=E", "AB/C=DE", "A/B=C/D"):
+            for division in ("exact", "floor"):
+                cp_sat = solve_cryptarithm(puzzle, backend="cp-sat", division=division)
+                self.assertEqual(cp_sat, solve_cryptarithm(puzzle, backend="backtracking", division=division))
+        # Exact quotients must be whole; floor division drops the remainder.
+        self.assertIn("(2*3)/4+9=10\nA=2 B=3 C=4 D=9 E=1 F=0", solve_cryptarithm("(A*B)/C+D=EF", division="floor"))
+        self.assertNotIn("(2*3)/4+9=10\nA=2 B=3 C=4 D=9 E=1 F=0", solve_cryptarithm("(A*B)/C+D=EF"))
+        self.assertIn("(60*79)/15+8=324\nA=6 B=0 C=7 D=9 E=1 F=5 G=8 H=3 I=2 J=4",
+                      solve_cryptarithm("(AB*CD)/EF+G=HIJ", backend="cp-sat"))
+        with self.assertRaises(ValueError):
+            solve_cryptarithm("A/B=C", division="round")
+
+    def test_values_beyond_64_bits_are_reported(self):
+        with self.assertRaises(ValueError) as raised:
+            solve_cryptarithm("ABCDEFGHIJKLM * B = ABCDEFGHIJKLM * B", base=36, backend="cp-sat")
+        self.assertIn("64-bit", str(raised.exception))
+        # Powers below the root are bounded by what the equation allows, not clipped to 64 bits.
+        for puzzle in ("A^B^C+D=EF", "EF-A^B^C=D", "A^B^C*D+E=FG", "(A^B^C)/D=EF"):
+            self.assertEqual(solve_cryptarithm(puzzle, backend="cp-sat"), solve_cryptarithm(puzzle, backend="backtracking"))
+        self.assertEqual(len(solve_cryptarithm("A^B^C+D=EF")), 23)
+        # Loose bounds through a signed product overshoot 64 bits; "auto" then falls back to backtracking.
+        puzzle = "(F-(DG*C)+BEA)=(CAE/CB/C*(G^AD-FG))"
+        with self.assertRaises(ValueError):
+            solve_cryptarithm(puzzle, base=8, backend="cp-sat")
+        self.assertEqual(solve_cryptarithm(puzzle, base=8), solve_cryptarithm(puzzle, base=8, backend="backtracking"))
+        self.assertEqual(list(iter_solutions(puzzle, base=8, encoding="words")), [])
+
+    def test_backtracking_validation_messages(self):
+        result = solve_cryptarithm("A + B = C", constraints={'A': 0}, backend="backtracking")
+        self.assertEqual(result, ["Invalid constraint: Letter 'A' cannot be zero."])
+        result = solve_cryptarithm("ABCDEFGHI + J = K", backend="backtracking")
+        self.assertEqual(result, ["Too many unique letters for base 10. The puzzle is unsolvable."])
+
+    def test_power(self):
+        solutions = solve_cryptarithm("A^B=C", backend="cp-sat")
+        self.assertEqual(solutions, ["2^3=8\nA=2 B=3 C=8", "3^2=9\nA=3 B=2 C=9"])
+
+    def test_power_with_long_word(self):
+        constraints = {'A': 2, 'B': 0, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7}
+        solutions = solve_cryptarithm("ABCDEFGH^I=ABCDEFGH", constraints=constraints, backend="cp-sat")
+        self.assertEqual(len(solutions), 2)
+        self.assertIn("20345678^1=20345678\nA=2 B=0 C=3 D=4 E=5 F=6 G=7 H=8 I=1", solutions)
+
+    def test_iter_solutions_matches_list(self):
+        for backend in ("cp-sat", "backtracking"):
+            stream = iter_solutions("WRONG + WRONG = RIGHT", backend=backend)
+            self.assertEqual(sorted(stream), solve_cryptarithm("WRONG + WRONG = RIGHT", backend=backend))
+            self.assertTrue(stream.complete)
+            self.assertEqual(stream.count, 21)
+
+    def test_iter_solutions_max_solutions(self):
+        for backend in ("cp-sat", "backtracking"):
+            stream = iter_solutions("WRONG + WRONG = RIGHT", backend=backend, max_solutions=2)
+            self.assertEqual(len(list(stream)), 2)
+            self.assertTrue(stream.truncated)
+            self.assertEqual(stream.stop_reason, "max_solutions")
+            stream = iter_solutions("WRONG + WRONG = RIGHT", backend=backend, max_solutions=0)
+            self.assertEqual(list(stream), [])
+            self.assertEqual((stream.count, stream.stop_reason), (0, "max_solutions"))
+            stream = iter_solutions("WRONG + WRONG = RIGHT", backend=backend, max_solutions=21)
+            self.assertEqual(len(list(stream)), 21)
+            self.assertEqual(stream.stop_reason, "max_solutions")
+
+    def test_iter_solutions_count_only(self):
+        for backend in ("cp-sat", "backtracking"):
+            stream = iter_solutions("WRONG + WRONG = RIGHT", backend=backend, count_only=True).run()
+            self.assertEqual(stream.count, 21)
+            self.assertTrue(stream.complete)
+
+    def test_iter_solutions_invalid_constraint(self):
+        stream = iter_solutions("A + B = C", constraints={'A': 0})
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.error, "Invalid constraint: Letter 'A' cannot be zero.")
+
+    def test_first_and_unique_modes(self):
+        every = solve_cryptarithm("WRONG + WRONG = RIGHT", backend="cp-sat")
+        for backend in ("cp-sat", "backtracking"):
+            first = solve_cryptarithm("WRONG + WRONG = RIGHT", backend=backend, mode="first", num_workers=2)
+            self.assertEqual(len(first), 1)
+            self.assertIn(first[0], every)
+            self.assertEqual(len(solve_cryptarithm("WRONG + WRONG = RIGHT", backend=backend, mode="unique")), 2)
+            self.assertEqual(solve_cryptarithm("SEND+MORE=MONEY", backend=backend, mode="unique"),
+                             ["9567+1085=10652\nD=7 E=5 M=1 N=6 O=0 R=8 S=9 Y=2"])
+        guided = solve_cryptarithm("SEND+MORE=MONEY", backend="cp-sat", mode="first", num_workers=1,
+                                   strategy="leading-first", hints={'S': 9, 'M': 1})
+        self.assertEqual(guided, ["9567+1085=10652\nD=7 E=5 M=1 N=6 O=0 R=8 S=9 Y=2"])
+
+    def test_compact_solutions(self):
+        for backend in ("cp-sat", "backtracking"):
+            solutions = solve_cryptarithm("WRONG + WRONG = RIGHT", backend=backend, compact=True)
+            self.assertEqual(len(solutions), 21)
+            self.assertEqual(solutions.nbytes, 21 * len(solutions.letters))
+            self.assertEqual(solutions.strings(), solve_cryptarithm("WRONG + WRONG = RIGHT", backend=backend))
+            self.assertEqual(sorted(solutions), solutions.strings())
+            self.assertEqual(solutions.as_dict(0)['W'], solutions.digits(0)[solutions.letters.index('W')])
+        invalid = solve_cryptarithm("A + B = C", constraints={'A': 0}, compact=True)
+        self.assertEqual((len(invalid), invalid.strings()), (0, ["Invalid constraint: Letter 'A' cannot be zero."]))
+
+    def test_stats_hook_receives_phases_and_model_size(self):
+        received = []
+        solve_cryptarithm("SEND + MORE = MONEY", backend="cp-sat", stats_hook=received.append)
+        stats = received[0]
+        self.assertEqual(set(stats.phases), {"parse", "letters", "presolve", "build", "solve", "format"})
+        self.assertEqual(stats.model["all_diff"], 1)
+        self.assertEqual(stats.search["status"], "OPTIMAL")
+        self.assertEqual((stats.solutions, stats.complete), (1, True))
+
+        add_stats_hook(received.append)
+        try:
+            solve_cryptarithm("SEND + MORE = MONEY", backend="backtracking")
+        finally:
+            remove_stats_hook(received.append)
+        self.assertEqual(received[1].backend, "backtracking")
+        self.assertGreater(received[1].search["nodes"], 0)
+
+    def test_stream_stats(self):
+        for backend in ("cp-sat", "backtracking"):
+            stream = iter_solutions("WRONG + WRONG = RIGHT", backend=backend, max_solutions=2, collect_stats=True)
+            list(stream)
+            self.assertEqual(stream.stats.solutions, 2)
+            self.assertFalse(stream.stats.complete)
+            self.assertIn("solve", stream.stats.phases)
+        self.assertIsNone(iter_solutions("SEND + MORE = MONEY").stats)
+
+    def test_solve_batch_keeps_order_and_isolates_errors(self):
+        items = ["SEND + MORE = MONEY", {"id": "bad", "puzzle": "A + B = C", "constraints": {"A": 0}},
+                 {"puzzle": "GREEN - BLUE = ORANGE", "base": 16}, "WRONG + WRONG = RIGHT"]
+        results = list(solve_batch(items, workers=2, timeout=10))
+        self.assertEqual([r["id"] for r in results], [0, "bad", 2, 3])
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "ok", "ok"])
+        self.assertEqual(results[0]["solutions"], solve_cryptarithm("SEND + MORE = MONEY"))
+        self.assertEqual(results[3]["count"], 21)
+
+        lines = io.StringIO('"SEND+MORE=MONEY"\n{"puzzle": "A+B=C",\n"WRONG+WRONG=RIGHT"\n')
+        results = list(solve_batch(list(read_jsonl(lines)) + [["A+B=C"]], workers=2, timeout=10))
+        self.assertEqual([(r["id"], r["status"]) for r in results], [(0, "ok"), (1, "error"), (2, "ok"), (3, "error")])
+        self.assertIn("Invalid JSON", results[1]["error"])
+        self.assertEqual(results[3]["error"], "Expected a JSON object or a puzzle string.")
+
+    def test_generator_keeps_unique_puzzles(self):
+        template = PuzzleTemplate("{} + {} = {}")
+        words = ["SEND", "MORE", "MONEY", "TO", "GO", "OUT"]
+        candidates = list(template.candidates(words))
+        self.assertIn("SEND + MORE = MONEY", candidates)
+        self.assertNotIn("MORE + SEND = MONEY", candidates)
+        self.assertNotIn("TO + GO = MONEY", candidates)
+        puzzles = list(generate_puzzles(words, "{} + {} = {}", workers=2))
+        self.assertEqual([p["puzzle"] for p in puzzles], ["SEND + MORE = MONEY", "TO + GO = OUT"])
+        for puzzle in puzzles:
+            self.assertEqual(solve_cryptarithm(puzzle["puzzle"]), [puzzle["solution"]])
+        self.assertEqual(len(list(generate_puzzles(words, "{} + {} = {}", workers=1, limit=1))), 1)
+        with self.assertRaises(ValueError):
+            PuzzleTemplate("X + {} = {}")
+
+    def test_service_over_http(self):
+        service = SolverService(workers=2, max_queue=2, timeout=10.0, max_solutions=5)
+        server = serve_http(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/solve"
+            body = json.dumps({"id": "w", "puzzle": "WRONG + WRONG = RIGHT", "max_solutions": 50}).encode()
+            result = json.loads(urllib.request.urlopen(urllib.request.Request(url, data=body)).read())
+            self.assertEqual((result["id"], result["status"], result["count"]), ("w", "ok", 5))
+            self.assertFalse(result["complete"])
+            self.assertEqual(service.solve({"puzzle": "A + B = C", "constraints": {"A": 0}})["status"], "error")
+            self.assertEqual(service.solve(["A + B = C"])["status"], "error")
+            sink = io.StringIO()
+            serve_stdin(service, io.StringIO('"A + B = AC"\n{"puzzle": "A + B = C",\n"SEND + MORE = MONEY"\n'), sink)
+            results = sorted((json.loads(line) for line in sink.getvalue().splitlines()), key=lambda r: r["id"])
+            self.assertEqual([(r["id"], r["status"]) for r in results], [(0, "ok"), (1, "error"), (2, "ok")])
+            self.assertIn("Invalid JSON", results[1]["error"])
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+    def test_service_hard_limit_ignores_queue_wait(self):
+        service = SolverService(workers=1, max_queue=4, timeout=0.5)
+        release = threading.Event()
+        try:
+            service._executor.submit(release.wait)  # Occupies the only worker.
+            with unittest.mock.patch("service.HARD_TIMEOUT_GRACE", 0.0):
+                results = []
+                clients = [threading.Thread(target=lambda: results.append(service.solve("SEND + MORE = MONEY")))
+                           for _ in range(3)]
+                for client in clients:
+                    client.start()
+                time.sleep(1.0)
+                release.set()
+                for client in clients:
+                    client.join()
+            self.assertEqual([result["status"] for result in results], ["ok"] * 3)
+            self.assertEqual(service.pending, 0)
+        finally:
+            release.set()
+            service.close()
+
+    def test_async_solver(self):
+        async def run():
+            async with AsyncSolver(max_concurrency=2) as solver:
+                results = await asyncio.gather(solver.solve("SEND + MORE = MONEY"),
+                                               solver.solve("WRONG + WRONG = RIGHT", backend="cp-sat"),
+                                               solver.solve("A + B ="))
+                streamed = sorted([solution async for solution in solver.iter_solutions("WRONG + WRONG = RIGHT")])
+
+                # A long enumeration stops soon after the awaiting task is cancelled.
+                task = asyncio.create_task(solver.solve("THIS + ISA + GREAT + TIME = WASTER", base=16,
+                                                        backend="cp-sat", encoding="words"))
+                await asyncio.sleep(0.3)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                start = asyncio.get_running_loop().time()
+            return results, streamed, asyncio.get_running_loop().time() - start
+
+        results, streamed, stop_time = asyncio.run(run())
+        self.assertEqual(results[0], solve_cryptarithm("SEND + MORE = MONEY"))
+        self.assertEqual(results[1], solve_cryptarithm("WRONG + WRONG = RIGHT"))
+        self.assertEqual(results[2], ["Expected a word, number or '(' but found end of expression at position 7."])
+        self.assertEqual(streamed, results[1])
+        self.assertLess(stop_time, 1.0)
+
+    def test_session_matches_fresh_solves(self):
+        session = session_for("WRONG + WRONG = RIGHT")
+        self.assertIs(session_for("WRONG + WRONG = RIGHT"), session)
+        for constraints in ({}, {'O': 3}, {'O': 3, 'R': 4}, {'W': 0}, {'G': 1}):
+            self.assertEqual(session.solve(constraints),
+                             solve_cryptarithm("WRONG + WRONG = RIGHT", constraints=constraints, backend="cp-sat"))
+        self.assertEqual([session.count({'O': 3}), session.count()], [1, 21])
+        self.assertEqual(PuzzleSession("A + B =").solve(), ["Expected a word, number or '(' but found end of expression at position 7."])
+
+    def test_presolve_narrows_domains_and_detects_infeasibility(self):
+        result = presolve("SEND + MORE = MONEY")
+        self.assertEqual((result.domains['M'], result.domains['S'], result.infeasible), ([1], [9], None))
+        self.assertIn("M = 1", result.derivations)
+        self.assertTrue(presolve("A + B = CDE").infeasible)
+        self.assertIsNotNone(presolve("AB * 2 = CDEF").infeasible)
+        for backend in ("cp-sat", "backtracking"):
+            self.assertEqual(solve_cryptarithm("A + B = CDE", backend=backend), ["No solution found"])
+            seen = []
+            solve_cryptarithm("A + B = CDE", backend=backend, stats_hook=seen.append)
+            self.assertTrue(seen[0].complete)
+            self.assertTrue(seen[0].presolve[-1].startswith("infeasible"))
+
+    # Seconds allowed for importing the CLI in a fresh interpreter; loading OR-Tools alone takes longer.
+    STARTUP_BUDGET = 0.25
+
+    def test_cli_start_up_is_lazy_and_within_budget(self):
+        script = ("import sys, time\n"
+                  "start = time.perf_counter()\n"
+                  "import main\n"
+                  "elapsed = time.perf_counter() - start\n"
+                  "loaded = 'ortools' in sys.modules or 'numpy' in sys.modules\n"
+                  "main.solve_cryptarithm('A + B =')\n"
+                  "print(elapsed, loaded, 'ortools' in sys.modules)\n")
+        runs = [subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split() for _ in range(3)]
+        self.assertLess(min(float(run[0]) for run in runs), self.STARTUP_BUDGET)
+        self.assertEqual({tuple(run[1:]) for run in runs}, {("False", "False")})
+
+    def test_cli_arguments(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main(["WRONG + WRONG = RIGHT", "--constraints", "O=3", "--backend", "backtracking"]), 0)
+            self.assertEqual(main(["A + B = CDE"]), 1)
+            with self.assertRaises(SystemExit):
+                main(["A + B = C", "--base", "40"])
+        self.assertIn("49306 + 49306 = 98612", output.getvalue())
+
+    def test_enumerate_to_file(self):
+        expected = solve_cryptarithm("WRONG + WRONG = RIGHT", compact=True)
+        rows = list(expected.iter_digits())
+        with tempfile.TemporaryDirectory() as directory:
+            for format in FORMATS:
+                path = os.path.join(directory, f"solutions.{format}")
+                result = enumerate_to_file("WRONG + WRONG = RIGHT", path, format=format)
+                self.assertEqual((result.count, result.complete), (21, True))
+                self.assertEqual(sorted(tuple(s.values()) for s in read_solutions(path)), rows)
+            # Tiny runs and fan-in force several spilled runs and merge passes.
+            path = os.path.join(directory, "sorted.bin")
+            with unittest.mock.patch("spill.MERGE_FAN_IN", 3):
+                result = enumerate_to_file("WRONG + WRONG = RIGHT", path, sort=True, run_size=2, temp_dir=directory)
+            self.assertEqual(result.letters, list(expected.letters))
+            self.assertEqual([tuple(s.values()) for s in read_solutions(path)], rows)
+            self.assertEqual(sorted(os.listdir(directory)), ["solutions.binary", "solutions.jsonl", "sorted.bin"])
+            self.assertEqual(enumerate_to_file("A + A = B", path, constraints={"A": 0}).count, 0)
+            self.assertEqual(enumerate_to_file("AB + CD = EF", path, max_solutions=5).stop_reason, "max_solutions")
+
+    def test_canonical_key_ignores_letters_and_spacing(self):
+        key, letters = canonicalize([parse_puzzle("SEND + MORE = MONEY")], 10, {})
+        self.assertEqual(key, canonicalize([parse_puzzle("ABCD+EFGB=EFCBH")], 10, {})[0])
+        self.assertEqual(letters, ['S', 'E', 'N', 'D', 'M', 'O', 'R', 'Y'])
+        self.assertNotEqual(key, canonicalize([parse_puzzle("SEND + MORE = MONEY")], 16, {})[0])
+
+    def test_cache_maps_solutions_back_to_caller_letters(self):
+        cache = SolutionCache()
+        self.assertEqual(solve_cryptarithm("SEND + MORE = MONEY", cache=cache), solve_cryptarithm("SEND + MORE = MONEY"))
+        solutions = solve_cryptarithm("ABCD+EFGB=EFCBH", cache=cache)
+        self.assertEqual(solutions, ["9567+1085=10652\nA=9 B=5 C=6 D=7 E=1 F=0 G=8 H=2"])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_cache_keeps_spacing_that_changes_leading_letters_apart(self):
+        for plain, spaced in (("ABC-DE=FG", "A BC-DE=FG"), ("AB+C=DE", "AB+C=D E"), ("ABC*D=EFG", "A BC*D=EFG")):
+            cache = SolutionCache()
+            self.assertEqual(solve_cryptarithm(plain, cache=cache), solve_cryptarithm(plain))
+            self.assertEqual(solve_cryptarithm(spaced, cache=cache), solve_cryptarithm(spaced))
+            self.assertEqual(cache.misses, 2)
+        self.assertEqual(len(solve_cryptarithm("A BC-DE=FG", cache=SolutionCache())), 188)
+
+    def test_cache_persists_to_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            cache = SolutionCache(path=path)
+            expected = solve_cryptarithm("WRONG + WRONG = RIGHT", cache=cache)
+            cache.close()
+            cache = SolutionCache(path=path)
+            self.assertEqual(solve_cryptarithm("WRONG + WRONG = RIGHT", cache=cache), expected)
+            self.assertEqual(cache.hits, 1)
+            cache.close()
+
+    def test_benchmark_rows_and_baseline_comparison(self):
+        rows = run_benchmarks([BenchmarkCase("send_more_money", "SEND + MORE = MONEY", backtracking=True)], repeat=1)
+        self.assertEqual({row["config"] for row in rows}, {"cp-sat/auto", "cp-sat/words", "cp-sat/columns", "backtracking"})
+        self.assertTrue(all(row["solutions"] == 1 and row["peak_rss_bytes"] > 0 for row in rows))
+        baseline = [dict(row, total_s=row["total_s"] / 10) for row in rows]
+        self.assertEqual(compare_to_baseline(rows, rows, tolerance=0.25, min_delta=0.0), [])
+        self.assertEqual(len(compare_to_baseline(rows, baseline, tolerance=0.25, min_delta=0.0)), len(rows))
+
+    def test_benchmark_reports_failures_and_missing_rows(self):
+        rows = run_benchmarks([BenchmarkCase("product", "AB*C=DE"), BenchmarkCase("broken", "AB+=C")], repeat=1)
+        self.assertEqual({(row["case"], row["config"]) for row in rows},
+                         {("product", "cp-sat/auto"), ("product", "cp-sat/words"),
+                          ("broken", "cp-sat/auto"), ("broken", "cp-sat/words"), ("broken", "cp-sat/columns")})
+        broken = [row for row in rows if row["case"] == "broken"]
+        self.assertTrue(all(row["error"] and row["solutions"] is None for row in broken))
+        good = [row for row in rows if row["case"] == "product"]
+        problems = compare_to_baseline(rows, rows, tolerance=0.25, min_delta=0.0)
+        self.assertEqual(len(problems), len(broken))
+        self.assertTrue(all("failed with ValueError" in problem for problem in problems))
+        problems = compare_to_baseline(good[:1], good, tolerance=0.25, min_delta=0.0)
+        self.assertEqual(problems, [f"product [{good[1]['config']}]: missing from this run"])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file